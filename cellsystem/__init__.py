@@ -1,3 +1,3 @@
-from .cellsystem import CellSystem
+from .cellsystem import CellSystem, CloneSystem
 
-__all__ = ['CellSystem']
+__all__ = ['CellSystem', 'CloneSystem']
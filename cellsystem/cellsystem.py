@@ -3,9 +3,14 @@ The cell simulation with logging.
 
 """
 
-from .simulation import System, CellLine, World, behavior
-from   .logging  import logged, FullLog
-import random as rnd
+from .simulation import System, CellLine, CellView, World, SparseWorld, behavior
+from .simulation import ClonePopulation
+from .simulation import kernels
+from .simulation.mutations import MutationKernel
+from .simulation.world import toroidal_wrap, clipped_wrap
+from   .logging  import logged, FullLog, CloneLog
+
+import numpy as np
 
 
 
@@ -18,6 +23,20 @@ class SimpleCells(CellLine):
         - Cell migration,
         - Cell genome mutation.
     
+    By default a mutating cell acquires exactly one mutation. If a 
+    `mutation_rate` is given, mutating cells and each daughter of a 
+    division acquire instead a Poisson distributed number of mutations
+    with that mean, drawn by a ``MutationKernel`` (optionally with a 
+    per-position rate profile and per-base weights).
+    
+    The probabilities of the behaviors are heritable traits of the 
+    cells, their ancestral values are the ``default_traits`` (updated 
+    with the given `traits`). If a `trait_effect` is given, each new 
+    genotype draws it's traits from the ones of it's parent, so that 
+    driver mutations can change the fitness of a clone (see 
+    ``TraitTable``). Bulk behaviors read the traits of a whole group of
+    cells as an array.
+    
     Each behavior has an associated probability and it
     is possible to assign different weights to them,
     so that some behaviors are more probable to be selected
@@ -26,15 +45,55 @@ class SimpleCells(CellLine):
     and add your own behaviors as in the '_init_behaviors'
     method of this class.
     
+    In synchronous steps, a `site_capacity` limits the number of cells
+    in a site. The sites requested by the migrations and the daughters
+    of the divisions are then resolved all at once (see 
+    ``resolve_placements``).
+    
     """
     
-    def __init__(self, *args, genome_alphabet=None, **kwargs):
+    # Ancestral probabilities of the behaviors
+    default_traits = {'mutability': 1.0,
+                      'motility': 1.0,
+                      'division': 1.0,
+                      'death': 0.6}
+    
+    def __init__(self, *args, genome_alphabet=None, 
+                       mutation_rate=None, 
+                       position_rates=None, 
+                       base_weights=None, 
+                       traits=None,
+                       site_capacity=None,
+                       **kwargs):
         
         # Initialize as usual.
-        super().__init__(*args, **kwargs)
+        traits = dict(self.default_traits, **(traits or {}))
+        super().__init__(*args, genome_alphabet=genome_alphabet, 
+                         traits=traits, **kwargs)
+        
+        # Cells allowed per site
+        if site_capacity is not None and not self.synchronous:
+            raise ValueError('A site capacity requires synchronous steps.')
+        if site_capacity is not None and self.hybrid is not None:
+            raise ValueError('A site capacity excludes the hybrid dynamics.')
+        self.site_capacity = site_capacity
+        
+        # Rate-based mutations
+        if mutation_rate is None:
+            self.mutation_kernel = None
+        else:
+            self.mutation_kernel = MutationKernel(mutation_rate,
+                                                  len(self.genome),
+                                                  self.genome_alphabet,
+                                                  position_rates,
+                                                  base_weights)
         
         # Register the default actions
         self.add_behaviors(*self._init_behaviors())
+        
+        # And their bulk counterparts
+        self.batch_behaviors.update(self._init_batch_behaviors())
+        self.aggregate_behaviors.update(self._init_aggregate_behaviors())
     # ---
     
     def _init_behaviors(self):
@@ -76,6 +135,37 @@ class SimpleCells(CellLine):
         return behaviors, weights
     # ---
     
+    def _init_batch_behaviors(self):
+        """Initialize the bulk versions of the behaviors.
+        
+        These act on arrays of slots of an array-backed lineage and are 
+        used instead of the per-cell behaviors when the lineage processes 
+        the cells in batches.
+        
+        """
+        return {'mutation': (self.batch_mutation_probability, 
+                             self.batch_mutation),
+                'migration': (self.batch_migration_probability, 
+                              self.batch_migration),
+                'division': (self.batch_division_probability, 
+                             self.batch_division),
+                'death': (self.batch_death_probability, self.batch_death)}
+    # ---
+    
+    def _init_aggregate_behaviors(self):
+        """Initialize the aggregate versions of the behaviors.
+        
+        These act on groups of cells of a genotype in aggregated sites,
+        all the groups at once, and are used for the interior of the tumour in the hybrid
+        dynamics (see ``HybridEngine``).
+        
+        """
+        return {'mutation': self.aggregate_mutation,
+                'migration': self.aggregate_migration,
+                'division': self.aggregate_division,
+                'death': self.aggregate_death}
+    # ---
+    
     @logged('newcell', prepare=False)
     def add_cell_to(self, site):
         """Add a new, initialized cell to the given site.
@@ -92,7 +182,7 @@ class SimpleCells(CellLine):
     @staticmethod
     def migration_probability(cell):
         """Migration probability for this cell."""
-        return 1
+        return cell.trait('motility')
     # ---
         
     @staticmethod
@@ -111,21 +201,35 @@ class SimpleCells(CellLine):
     @staticmethod
     def mutation_probability(cell):
         """Probability to mutate if selected for it."""
-        return 1
+        return cell.trait('mutability')
     # ---
     
     @staticmethod
     def mutation(cell, *args, **kwargs):
-        """Do a single site mutation."""
+        """Do a single site mutation.
+        
+        In the infinite-sites model, the mutation hits a new site.
+        With a mutation kernel, a random number of mutations is added.
+        
+        """
+        kernel = cell.lineage.mutation_kernel
+        if kernel:
+            kernel.mutate_cells([cell])
+            return cell
+        
+        if cell.lineage.infinite_sites:
+            cell.add_novel_mutation()
+            return cell
         
         # Get the genome characteristics
-        # Convert alphabet to tuple to call rnd.choice with it
+        # Convert alphabet to tuple to call rng.choice with it
         alphabet = tuple(cell.genome_alphabet)
-        genome_length = len(cell.genome)
+        genome_length = len(cell.ancestral_genome)
         
         # Assemble the mutation
-        position = rnd.randrange(genome_length) # Pick a random position in the genome
-        mutated = rnd.choice(alphabet)
+        rng = cell.lineage.rng
+        position = rng.randrange(genome_length) # Pick a random position in the genome
+        mutated = rng.choice(alphabet)
         
         # Mutate
         cell.add_mutation(position, mutated)
@@ -138,7 +242,7 @@ class SimpleCells(CellLine):
         """Cellular death probability."""
         # Avoid killing all cells.
         if cell.lineage.total_cells > 1:
-            return 0.6
+            return cell.trait('death')
         else:
             return 0
     # ---
@@ -168,7 +272,7 @@ class SimpleCells(CellLine):
     @staticmethod
     def division_probability(cell):
         """Probability that this cell will divide if selected for division."""
-        return 1
+        return cell.trait('division')
     # ---
     
     @staticmethod
@@ -192,9 +296,339 @@ class SimpleCells(CellLine):
             # Remove previous cell
             SimpleCells.death(cell)
             
+            # Replication errors
+            kernel = cell.lineage.mutation_kernel
+            if kernel:
+                kernel.mutate_cells([daughter, other_daughter])
+            
         return daughter, other_daughter
     # ---
     
+    def batch_mutation_probability(self, slots):
+        """Probability to mutate for each cell in the group."""
+        return self.trait_values('mutability', slots)
+    # ---
+    
+    def batch_mutation(self, slots, *args, log=None, **kwargs):
+        """Do a single site mutation on each of the cells."""
+        columns = self.columns
+        genotypes = self._mutated_genotypes(columns.genotype[slots])
+        if not log:
+            columns.set_genotypes(slots, genotypes)
+            return
+        
+        for slot, genotype in zip(slots.tolist(), genotypes.tolist()):
+            cell = CellView(self, slot)
+            log.preparefor('mutation', cell)
+            cell.genotype = genotype
+            log.log('mutation', cell)
+    # ---
+    
+    def batch_migration(self, slots, *args, log=None, **kwargs):
+        """Migrate each of the cells to a neighboring site."""
+        world = self.columns.world
+        destinations = world.random_neighbor_coordinates(
+                                                self.columns.coordinates[slots])
+        self._move(slots, destinations, log=log)
+    # ---
+    
+    def _move(self, slots, destinations, log=None):
+        """Move each of the cells to the respective (n x d) coordinates."""
+        columns = self.columns
+        if not log:
+            columns.place_many(slots, destinations)
+            return
+        
+        sites = columns.world.sites_at(destinations)
+        for slot, destination in zip(slots.tolist(), sites):
+            cell = CellView(self, slot)
+            log.preparefor('migration', cell)
+            cell.site = destination
+            log.log('migration', cell)
+    # ---
+    
+    def batch_migration_probability(self, slots):
+        """Migration probability for each cell in the group."""
+        return self.trait_values('motility', slots)
+    # ---
+    
+    def batch_death_probability(self, slots):
+        """Cellular death probability for each cell in the group."""
+        # Avoid killing all cells.
+        if self.total_cells > 1:
+            return self.trait_values('death', slots)
+        return np.zeros(len(slots))
+    # ---
+    
+    def batch_death(self, slots, *args, log=None, **kwargs):
+        """Cellular death of each of the cells."""
+        # Avoid killing all cells.
+        if len(slots) >= self.total_cells:
+            slots = np.delete(slots, self.rng.integers(len(slots)))
+        
+        columns = self.columns
+        if not log:
+            columns.unplace_many(slots)
+        else:
+            for slot in slots.tolist():
+                cell = CellView(self, slot)
+                log.preparefor('death', cell)
+                cell.site = None
+                log.log('death', cell)
+        
+        columns.release_many(slots)
+    # ---
+    
+    def batch_division_probability(self, slots):
+        """Division probability for each cell in the group."""
+        return self.trait_values('division', slots)
+    # ---
+    
+    def batch_division(self, slots, *args, log=None, **kwargs):
+        """Cell division of each of the cells.
+        
+        Each cell is replaced by two daughters placed in 
+        neighboring sites.
+        
+        """
+        self._divide(slots, log=log)
+    # ---
+    
+    def _divide(self, slots, destinations=None, log=None):
+        """Replace each of the cells by two daughters.
+        
+        The daughters are placed at the given (2n x d) coordinates, two
+        consecutive rows per father, by default in random neighbors of 
+        their father.
+        
+        """
+        columns = self.columns
+        world = columns.world
+        
+        # Reserve the daughters, two for each father
+        fathers = np.repeat(slots, 2)
+        n_daughters = len(fathers)
+        indices = self.current_index + np.arange(n_daughters)
+        self.current_index += n_daughters
+        daughters = columns.allocate_many(indices, 
+                                          columns.index[fathers],
+                                          columns.genotype[fathers],
+                                          reuse=self.recycle_dead)
+        
+        # Replication errors
+        if self.mutation_kernel:
+            genotypes = self.mutation_kernel.mutate(columns.genotype[daughters],
+                                                    self.genotypes,
+                                                    rng=self.rng)
+            columns.set_genotypes(daughters, genotypes)
+        
+        if destinations is None:
+            destinations = world.random_neighbor_coordinates(
+                                                    columns.coordinates[fathers])
+        
+        # Place the daughters and remove the fathers
+        if not log:
+            columns.unplace_many(slots)
+            columns.place_many(daughters, destinations)
+        else:
+            sites = world.sites_at(destinations).reshape(-1, 2)
+            for slot, (d1, d2), (s1, s2) in zip(slots.tolist(), 
+                                                daughters.reshape(-1, 2).tolist(),
+                                                sites):
+                father = CellView(self, slot)
+                log.preparefor('division', father)
+                
+                d1, d2 = CellView(self, d1), CellView(self, d2)
+                d1.site, d2.site = s1, s2
+                father.site = None
+                
+                log.log('division', (d1, d2))
+        
+        columns.release_many(slots)
+    # ---
+    
+    def apply_synchronous(self, accepted, *args, log=None, **kwargs):
+        """Apply the behaviors accepted in a synchronous step.
+        
+        With a site capacity, the destinations of the migrations and the
+        divisions are resolved against the state at the start of the step
+        before anything is applied (see ``resolve_placements``).
+        
+        """
+        if self.site_capacity is None:
+            return super().apply_synchronous(accepted, *args, 
+                                             log=log, **kwargs)
+        
+        names = [action.name for action in self.behavior_table.actions]
+        groups = dict(zip(names, accepted))
+        empty = np.empty(0, dtype=np.int64)
+        (migrants, migrations), (fathers, divisions) = self.resolve_placements(
+                                                groups.get('migration', empty),
+                                                groups.get('division', empty),
+                                                groups.get('death', empty))
+        
+        # The rest of the behaviors, as usual
+        placing = ('migration', 'division')
+        super().apply_synchronous([empty if name in placing else group
+                                   for name, group in zip(names, accepted)],
+                                  *args, log=log, **kwargs)
+        
+        if len(migrants):
+            self._move(migrants, migrations, log=log)
+        if len(fathers):
+            self._divide(fathers, divisions, log=log)
+    # ---
+    
+    def resolve_placements(self, migrants, fathers, deaths=()):
+        """Resolve the destinations of a synchronous step, with capacity.
+        
+        Each migrant requests a random neighbor site and each father two,
+        one per daughter. The free places of a site are it's capacity 
+        minus the cells that stay in it (all but the dying ones), and they
+        are given to the requests in order of the index of the requesting
+        cell (the first daughter of a father before the second). 
+        
+        A migrant whose request fails stays where it is. A daughter whose
+        request fails takes the place of it's father, and if both fail, 
+        the father does not divide.
+        
+        Return the pairs ``(migrants, coordinates)`` and ``(fathers, 
+        coordinates)`` of the cells that move or divide and the coordinates
+        of their destinations (two consecutive rows per father).
+        
+        """
+        columns = self.columns
+        world = columns.world
+        ndim = columns.coordinates.shape[1]
+        
+        # Requests
+        origins = columns.coordinates[fathers]
+        migrations = world.random_neighbor_coordinates(columns.coordinates[migrants])
+        divisions = world.random_neighbor_coordinates(np.repeat(origins, 2, axis=0))
+        requesters = np.concatenate([columns.index[migrants], 
+                                     np.repeat(columns.index[fathers], 2)])
+        
+        # Number the sites involved
+        parts = [columns.coordinates[columns.alive_slots],
+                 columns.coordinates[deaths],
+                 np.concatenate([migrations, divisions])]
+        numbers, size = self._site_numbers(world, np.concatenate(parts))
+        alive, dying, targets = np.split(numbers, 
+                                         np.cumsum([len(p) for p in parts[:2]]))
+        
+        # Free places
+        occupancy = kernels.site_occupancy(alive, size)
+        occupancy -= kernels.site_occupancy(dying, size)
+        free = np.maximum(self.site_capacity - occupancy, 0)
+        
+        # Grant the places of each site by index of the requester
+        granted = kernels.grant_places(targets, requesters, free)
+        
+        moving = granted[:len(migrants)]
+        migrations = migrations[moving]
+        
+        placed = granted[len(migrants):].reshape(-1, 2)
+        divisions = divisions.reshape(-1, 2, ndim)
+        stay = np.repeat(origins[:, None, :], 2, axis=1)
+        divisions[~placed] = stay[~placed]
+        dividing = placed.any(axis=1)
+        divisions = divisions[dividing].reshape(-1, ndim)
+        
+        return (migrants[moving], migrations), (fathers[dividing], divisions)
+    # ---
+    
+    @staticmethod
+    def _site_numbers(world, coordinates):
+        """Number the sites at the given (n x d) in-range coordinates.
+        
+        Return the number of the site of each row and the total of 
+        numbers used: the flat indices of the grid for a dense world,
+        else consecutive numbers for the distinct sites (sparse worlds 
+        may be too big to number all of their sites).
+        
+        """
+        if not isinstance(world, SparseWorld):
+            numbers = np.ravel_multi_index(coordinates.T, world.shape)
+            return numbers, int(np.prod(world.shape))
+        
+        if not len(coordinates):
+            return np.empty(0, dtype=np.int64), 0
+        
+        # Flat indices in the box around the coordinates, when they fit
+        low = coordinates.min(axis=0)
+        box = coordinates.max(axis=0) - low + 1
+        if np.prod(box, dtype=float) < 2**62:
+            keys = np.ravel_multi_index(tuple((coordinates - low).T), box)
+            distinct, numbers = np.unique(keys, return_inverse=True)
+        else:
+            distinct, numbers = np.unique(coordinates, axis=0, 
+                                          return_inverse=True)
+        return numbers.reshape(-1), len(distinct)
+    # ---
+    
+    def _mutated_genotypes(self, genotypes):
+        """The genotypes that result from mutating each of the given."""
+        table = self.genotypes
+        if self.mutation_kernel:
+            return self.mutation_kernel.mutate(genotypes, table, rng=self.rng)
+        
+        if self.infinite_sites:
+            return table.derive_novel_many(genotypes)
+        
+        alphabet = tuple(self.genome_alphabet)
+        positions = self.rng.integers(len(self.genome), size=len(genotypes))
+        bases = self.rng.integers(len(alphabet), size=len(genotypes))
+        return table.derive_many(genotypes, positions, bases, alphabet)
+    # ---
+    
+    def _aggregate_origins(self, sites, counts):
+        """The coordinates of the sites, each repeated as many times as counted."""
+        coordinates = np.array([site.coordinates for site in sites.tolist()])
+        return np.repeat(coordinates, counts, axis=0)
+    # ---
+    
+    def aggregate_mutation(self, sites, genotypes, counts, log=None):
+        """Mutate ``counts[k]`` aggregated cells of ``genotypes[k]`` in ``sites[k]``."""
+        mutated = self._mutated_genotypes(np.repeat(genotypes, counts))
+        self.hybrid.remove_many(sites, genotypes, counts)
+        self.hybrid.add_many(np.repeat(sites, counts), mutated, log=log)
+    # ---
+    
+    def aggregate_migration(self, sites, genotypes, counts, log=None):
+        """Migrate the aggregated cells to neighboring sites."""
+        origins = self._aggregate_origins(sites, counts)
+        destinations = self.hybrid.world.random_neighbors(origins)
+        self.hybrid.remove_many(sites, genotypes, counts)
+        self.hybrid.add_many(destinations, np.repeat(genotypes, counts), 
+                             log=log)
+    # ---
+    
+    def aggregate_death(self, sites, genotypes, counts, log=None):
+        """Cellular death of the aggregated cells."""
+        self.hybrid.remove_many(sites, genotypes, counts)
+    # ---
+    
+    def aggregate_division(self, sites, genotypes, counts, log=None):
+        """Cell division of the aggregated cells.
+        
+        Each cell is replaced by two daughters placed in 
+        neighboring sites.
+        
+        """
+        origins = self._aggregate_origins(sites, 2*counts)
+        destinations = self.hybrid.world.random_neighbors(origins)
+        
+        daughters = np.repeat(genotypes, 2*counts)
+        if self.mutation_kernel:
+            # Replication errors
+            daughters = self.mutation_kernel.mutate(daughters, 
+                                                    self.genotypes,
+                                                    rng=self.rng)
+        
+        self.hybrid.remove_many(sites, genotypes, counts)
+        self.hybrid.add_many(destinations, daughters, log=log)
+    # ---
+    
 # --- SimpleCells
 
 
@@ -260,7 +694,7 @@ class CellSystem(System):
         Cell no. 6 mutating @ site (50, 51) (father 4)
                         Initial mutations: [(9, 'G'), (8, 'T')]
                                 Initial genome: AAAAAAAATG
-                        Final mutations: [(9, 'G'), (8, 'T'), (8, 'A')]
+                        Final mutations: [(9, 'G')]
                                 Final genome: AAAAAAAAAG
         Cell no. 5 dividing @ (50, 50)
                 New cells: 7 @ (51, 51) and 8 @ (50, 50)
@@ -317,20 +751,93 @@ class CellSystem(System):
     
     def __init__(self, *args, 
                        grid_shape=(100, 100), 
+                       sparse=False,
+                       unbounded=False,
+                       bounded=False,
+                       neighborhood='moore',
                        init_genome=None,
+                       array_backed=False,
+                       batched=False,
+                       synchronous=False,
+                       site_capacity=None,
+                       infinite_sites=False,
+                       mutation_rate=None,
+                       continuous_time=False,
+                       hybrid=False,
+                       clocks=None,
+                       traits=None,
+                       trait_effect=None,
                        **kwargs):
-        """Initialization process."""
+        """Initialization process.
+
+        If `sparse` is True, the sites of the world are created in chunks,
+        as the cells reach them, instead of all at once. If `unbounded`
+        is True, the world is sparse and grows without bounds instead of
+        wrapping (`grid_shape` only gives it's number of dimensions, and
+        the first cell is placed at the origin). See ``SparseWorld``.
+        If `bounded` is True, the borders of the world are walls instead
+        of wrapping around (see ``clipped_wrap``).
+        The `grid_shape` may have any number of dimensions, and the 
+        `neighborhood` of the sites may be 'moore', 'von_neumann' or 
+        'hexagonal' (see ``neighborhoods``).
+        If `array_backed` is True, the cells are stored as NumPy columns
+        instead of individual objects (useful for big populations).
+        If `batched` is True, the cells are processed all at once on 
+        each step (implies `array_backed`).
+        If `synchronous` is True, all the cells decide their behaviors
+        against the state at the start of each step (implies 
+        `array_backed`), and a `site_capacity` may be given to limit the
+        number of cells per site (see ``SimpleCells``).
+        If `infinite_sites` is True, each mutation hits a new site (see
+        ``CellLine``). If a `mutation_rate` is given, mutations are drawn
+        with that mean per mutation or division (see ``SimpleCells``).
+        If `continuous_time` is True, each step lets one unit of time 
+        pass, in which the cells act one event at a time (see 
+        ``GillespieEngine``).
+        If `hybrid` is True, the cells in the dense interior of the 
+        tumour are kept as clone counts per site and only the boundary 
+        cells are tracked individually (see ``HybridEngine``).
+        If `clocks` are given (a mapping of behavior names to functions 
+        drawing waiting times, in steps), each cell performs them when 
+        it's clocks ring (see ``CellCycleScheduler``).
+        The `traits` override the ancestral probabilities of the 
+        behaviors, and a `trait_effect` lets mutations change them (see
+        ``SimpleCells``).
+
+        """
         
         super().__init__(*args, **kwargs)
         
         # Initialize world
-        self.add_entity( World(shape=grid_shape), 
+        wrap = clipped_wrap if bounded else toroidal_wrap
+        if unbounded:
+            world = SparseWorld(shape=None, ndim=len(grid_shape),
+                                neighborhood=neighborhood)
+        elif sparse:
+            world = SparseWorld(shape=grid_shape, wrap=wrap,
+                                neighborhood=neighborhood)
+        else:
+            world = World(shape=grid_shape, wrap=wrap,
+                          neighborhood=neighborhood)
+        self.add_entity( world, 
                          name='world', 
                          procesable=False) # <- This means that this
                                            #    is a passive entity.
         
         # Initialize the cells
-        self.add_entity( SimpleCells(genome=init_genome),
+        self.add_entity( SimpleCells(genome=init_genome,
+                                     array_backed=(array_backed or batched
+                                                   or synchronous),
+                                     batched=batched,
+                                     synchronous=synchronous,
+                                     site_capacity=site_capacity,
+                                     infinite_sites=infinite_sites,
+                                     mutation_rate=mutation_rate,
+                                     continuous_time=continuous_time,
+                                     hybrid=hybrid,
+                                     clocks=clocks,
+                                     traits=traits,
+                                     trait_effect=trait_effect),
                          name='cells')
         
         # Initialize log
@@ -346,3 +853,62 @@ class CellSystem(System):
                                    log=self.log )
     # ---
 # --- CellSystem
+
+
+
+class CloneSystem(System):
+    """A system simulating the growth of clones, without space.
+    
+    The cells are tracked only by their clone sizes (see 
+    ``ClonePopulation``), which is enough when positions do not matter
+    and allows for much bigger populations. The population can be 
+    accessed by ``system['clones']`` and the tree of clones is recorded
+    by the log.
+    
+    Example:
+    
+    .. code-block:: python
+    
+        >>> system = CloneSystem(birth_rate=1, death_rate=0.5,
+                                 mutation_rate=0.01)
+        >>> system.seed()
+        >>> system.run(steps=30)
+        
+        # The sizes of the current clones
+        >>> system['clones'].clone_sizes()
+        
+        # And their phylogeny
+        >>> print(system.log.fetch_tree(prune_death=True))
+
+    """
+    
+    def __init__(self, *args, 
+                       init_genome=None,
+                       birth_rate=1.0,
+                       death_rate=0.5,
+                       mutation_rate=0.01,
+                       infinite_sites=False,
+                       **kwargs):
+        """Initialization process.
+        
+        Each step lets a unit of time pass (see ``ClonePopulation`` for 
+        the meaning of the rates).
+        
+        """
+        super().__init__(*args, **kwargs)
+        
+        self.add_entity( ClonePopulation(genome=init_genome,
+                                         birth_rate=birth_rate,
+                                         death_rate=death_rate,
+                                         mutation_rate=mutation_rate,
+                                         infinite_sites=infinite_sites),
+                         name='clones')
+        
+        self.register_log( CloneLog() )
+    # ---
+    
+    def seed(self, n=1):
+        'Start with `n` cells of the ancestral genotype.'
+        self['clones'].seed(n, log=self.log)
+    # ---
+# --- CloneSystem
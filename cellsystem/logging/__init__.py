@@ -5,11 +5,11 @@ analysis and history.
 """
 
 from .geometric import GeometricLog
-from .treelogs import MutationsLog, AncestryLog
+from .treelogs import MutationsLog, AncestryLog, CloneLog
 from .printer import PrinterLog
 from .full import FullLog
 from .logged import logged
 
 __all__ = ['FullLog', 'PrinterLog', 
-           'MutationsLog', 'AncestryLog', 
+           'MutationsLog', 'AncestryLog', 'CloneLog',
            'GeometricLog', 'logged']
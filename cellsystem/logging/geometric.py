@@ -20,7 +20,19 @@ class GeometricLog(WeakLog):
     """Registers the geometric positions of the cells in time.
     
     One may view the state of a GeometricLog object 'glog' by
-    'glog.worldlines().show()'
+    'glog.worldlines().show()', for worlds of 1, 2 or 3 dimensions::
+    
+        >>> system = CellSystem(grid_shape=(10, 10, 10))
+        >>> system.seed()
+        >>> system.run(steps=10)
+        >>> system.log['geometry'].worldlines().show()
+        
+        # A 1D world
+        >>> system = CellSystem(grid_shape=(40,))
+        >>> system.seed()
+        >>> system.run(steps=10)
+        >>> system.log['geometry'].worldlines().show(savefig='1d.png')
+        
     """
 
     def __init__(self, *args, **kwargs):
@@ -53,18 +65,15 @@ class GeometricLog(WeakLog):
         #   division: ( father, ((d1,site), (d2,site)) )
         #   death: (cell, None)
         #   and migration: (cell, site)
+        # where a site is a tuple of coordinates, of any length
         cell, other = change
         if other is None:
             return "death"
         
-        else:
-            # Check division
-            try:
-                (d1, site), (d2, site) = other
-                return "division"
-            # Check migration
-            except TypeError:
-                return "migration"
+        # A division holds (index, site) pairs, a site holds numbers
+        if isinstance(other[0], tuple):
+            return "division"
+        return "migration"
     # ---
     
     def iter_changes(self):
@@ -256,23 +265,41 @@ class WorldLines:
     # ---
     
     def show(self, div_marker='o', end_marker='', savefig=None):
-        "Render the 3D worldlines as a plot."
+        """Render the worldlines as a plot.
+        
+        The worldlines of a 2D world are drawn in 3D as (t, x, y), the ones
+        of a 1D world in the plane as (t, x), and the ones of a 3D world 
+        as their paths in space (x, y, z), time left out.
         
+        """
         fig = plt.figure()
-        ax = fig.gca(projection='3d')
+        events = next(iter(self.worldlines.values()), ((0, 0, 0),))
+        ndim = len(events[0]) - 1
+        if ndim == 1:
+            ax = fig.add_subplot()
+            labels = ('t', 'x')
+        elif ndim == 2:
+            ax = fig.add_subplot(projection='3d')
+            labels = ('t', 'x', 'y')
+        else:
+            ax = fig.add_subplot(projection='3d')
+            labels = ('x', 'y', 'z')
 
         for cell,timeline in self:
-            t, x, y = zip(*timeline)
-            ax.plot(t, x, y)
+            axes = list(zip(*timeline))
+            if ndim == 3:
+                axes = axes[1:]  # Leave time out
+            ax.plot(*axes)
             
             # Mark the beginning of a worldline
-            ax.scatter(t[0], x[0], y[0], marker=div_marker)
+            ax.scatter(*[points[0] for points in axes], marker=div_marker)
             # Mark the end of a worldline
-            ax.scatter(t[-1], x[-1], y[-1], marker=end_marker)
+            ax.scatter(*[points[-1] for points in axes], marker=end_marker)
             
-            ax.set_xlabel('t')
-            ax.set_ylabel('x')
-            ax.set_zlabel('y')
+        ax.set_xlabel(labels[0])
+        ax.set_ylabel(labels[1])
+        if len(labels) == 3:
+            ax.set_zlabel(labels[2])
             
         # Save to a file
         if savefig:
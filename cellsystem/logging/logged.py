@@ -35,23 +35,33 @@ def logged(action_name, prepare=True):
     
     return result
     ```
+    
+    The original function remains accessible as `logf.unlogged`, so
+    that callers that know there is no log can skip the wrapper.
         
     """
     # Real decorator
     def add_logging(action):
         # Decorated
-        @wraps(action)
-        def logged_action(self, *args, log=None, **kwargs):
-            if log and prepare:
+        if prepare:
+            @wraps(action)
+            def logged_action(self, *args, log=None, **kwargs):
+                if not log:
+                    return action(self, *args, **kwargs)
+                    
                 log.preparefor(action_name, self)
-                
-            result = action(self, *args, **kwargs)
-            
-            if log:
+                result = action(self, *args, **kwargs)
                 log.log(action_name, result)
-                
-            return result
+                return result
+        else:
+            @wraps(action)
+            def logged_action(self, *args, log=None, **kwargs):
+                result = action(self, *args, **kwargs)
+                if log:
+                    log.log(action_name, result)
+                return result
         # ---
+        logged_action.unlogged = action
         return logged_action
     return add_logging
 # ---
@@ -117,15 +117,19 @@ class MutationsLog(TreeLog):
 
     def log_division(self, daughters):
         'Remove the father from the alive cells.'
-        d1, d2 = daughters
         father = self.tmp
         
         # Replace the genome representative.
         # Now the daughter cells are representatives
         # as having the genome of the father.
         genome_node = self.alive[father]
-        self.alive[d1.index] = genome_node
-        self.alive[d2.index] = genome_node
+        for daughter in daughters:
+            if str(daughter.genome) == genome_node.name:
+                self.alive[daughter.index] = genome_node
+            else:
+                # The daughter mutated while dividing
+                child = genome_node.add_child(name=str(daughter.genome))
+                self.alive[daughter.index] = child
         
         # Cleanup
         del self.alive[father]
@@ -140,3 +144,37 @@ class MutationsLog(TreeLog):
         self.alive[cell.index] = child
     # ---
 # --- MutationsLog
+
+
+class CloneLog(TreeLog):
+    """A tree log that maintains the tree of clones of a population.
+    
+    Each node represents a genotype, named by it's genome, and it's 
+    children are the clones founded by it's mutant cells. It is the 
+    clone-level counterpart of the ``MutationsLog`` and the 
+    ``AncestryLog`` for populations tracked only by clone sizes (see
+    ``ClonePopulation``).
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.nodes = dict()  # Genotype -> node, extinct ones included
+    # ---
+    
+    def log_newclone(self, population, genotype):
+        "Add the clone as a child of the clone of it's parent genotype."
+        node = self.nodes.get(genotype)
+        if node is None:
+            # A brand new genotype
+            table = population.genotypes
+            parent = self.nodes.get(table.parents[genotype], self.tree)
+            node = parent.add_child(name=str(table.genome(genotype)))
+            self.nodes[genotype] = node
+        self.alive[genotype] = node
+    # ---
+    
+    def log_extinction(self, population, genotype):
+        # No need to keep tracking
+        del self.alive[genotype]
+    # ---
+# --- CloneLog
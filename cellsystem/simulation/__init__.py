@@ -1,6 +1,9 @@
 from .system import System
-from .cells import CellLine, behavior
-from .world import World
+from .cells import CellLine, CellView, behavior, batch_behavior
+from .world import World, SparseWorld
+from .neighborhoods import Neighborhood
+from .clones import ClonePopulation
 from .action import Action
 
-__all__ = ['System', 'CellLine', 'Action', 'World', 'behavior']
+__all__ = ['System', 'CellLine', 'CellView', 'Action', 'World', 'SparseWorld',
+           'Neighborhood', 'behavior', 'batch_behavior', 'ClonePopulation']
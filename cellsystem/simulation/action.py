@@ -1,4 +1,9 @@
-from numpy import random as rnd
+import inspect
+
+import numpy as np
+
+from ..utils.alias import AliasTable
+from ..utils.rng import default_stream
 
 class Action:
     """Objects of this class represent actions with an 
@@ -47,7 +52,16 @@ class Action:
             >>> p = action.probability(1,2,3,4)
             
             >>> action.try_action(probability=p)            
+    
+        When the first argument is the subject of the action (as with 
+        cell behaviors), ``perform`` evaluates the probability and calls 
+        the action in a single, precompiled step::
+        
+            >>> action = Action(a_func, complex_prob)
+            >>> action.perform(cell)
     """
+    __slots__ = ('action', 'probability', 'name', 
+                 'kind', 'unlogged', 'evaluate', 'perform')
 
     def __init__(self, action, probability=None, name=None):
         """
@@ -59,6 +73,10 @@ class Action:
                     The numeric probability or probability function.
                     Default is 1 (do always).
             
+        The kind of probability (see ``classify``) is determined only once,
+        here, and the ``evaluate`` and ``perform`` methods are bound to
+        versions specialized for it.
+            
         """
         if probability is None:
             probability = 1
@@ -66,6 +84,13 @@ class Action:
         self.action = action
         self.probability = probability
         self.name=name
+        
+        # The action without logging (see the `logged` decorator)
+        self.unlogged = getattr(action, 'unlogged', action)
+        
+        self.kind = self.classify(probability)
+        self.evaluate = self._compile_evaluate()
+        self.perform = self._compile_perform()
     # ---
     
     def __repr__(self):
@@ -83,18 +108,270 @@ class Action:
         """Equivalent to calling ``try_action(*args, **kwargs)``."""
         return self.action(*args, **kwargs)
     # ---
+    
+    @staticmethod
+    def classify(probability):
+        """Classify a probability as 'constant', 'nullary' or 'per-cell'.
+        
+        A constant is a numeric value, a nullary probability is a function
+        without required parameters, and a per-cell probability is a 
+        function of the subject of the action.
+        
+        """
+        if not callable(probability):
+            return 'constant'
+            
+        try:
+            parameters = inspect.signature(probability).parameters.values()
+        except (TypeError, ValueError):
+            # No signature available, assume the general case
+            return 'per-cell'
+            
+        required = [p for p in parameters
+                        if p.default is p.empty
+                        and p.kind in (p.POSITIONAL_ONLY, 
+                                       p.POSITIONAL_OR_KEYWORD)]
+        return 'per-cell' if required else 'nullary'
+    # ---
+    
+    def _compile_evaluate(self):
+        """Bind the probability evaluation for a subject."""
+        probability = self.probability
+        
+        if self.kind == 'constant':
+            return lambda subject: probability
+        elif self.kind == 'nullary':
+            return lambda subject: probability()
+        else:
+            return probability
+    # ---
+    
+    def _compile_perform(self):
+        """Bind the fastest way to try the action on a subject.
+        
+        The bound ``perform(subject, *args, log=None, rng=..., **kwargs)``
+        tries the action according to it's probability, drawn from the
+        given ``RandomStream``. When no log is given, the action is called
+        without the logging wrapper.
+        
+        """
+        action, unlogged = self.action, self.unlogged
+        probability = self.probability
+        
+        if self.kind == 'constant':
+            def perform(subject, *args, log=None, rng=default_stream, **kwargs):
+                if probability < 1 and rng.random() >= probability:
+                    return None
+                if log is None:
+                    return unlogged(subject, *args, **kwargs)
+                return action(subject, *args, log=log, **kwargs)
+            
+        elif self.kind == 'nullary':
+            def perform(subject, *args, log=None, rng=default_stream, **kwargs):
+                if rng.random() >= probability():
+                    return None
+                if log is None:
+                    return unlogged(subject, *args, **kwargs)
+                return action(subject, *args, log=log, **kwargs)
+            
+        else:
+            def perform(subject, *args, log=None, rng=default_stream, **kwargs):
+                if rng.random() >= probability(subject):
+                    return None
+                if log is None:
+                    return unlogged(subject, *args, **kwargs)
+                return action(subject, *args, log=log, **kwargs)
+            
+        return perform
+    # ---
 
-    def try_action(self, *args, probability=None, **kwargs):
-        """Perform the action according to it's probability."""
+    def try_action(self, *args, probability=None, rng=None, **kwargs):
+        """Perform the action according to it's probability.
+        
+        If no probability is given, a per-cell probability is evaluated
+        with the first argument. The draw is taken from the given
+        ``RandomStream``.
+        
+        """
         if probability is None:
-            try:
-                # Check if a probability function was given
-                probability = self.probability()
-            except TypeError:
-                # A numeric value vas given
-                probability = self.probability
-            
-        if rnd.random() < probability:
+            probability = self.evaluate(args[0] if args else None)
+        if rng is None:
+            rng = default_stream
+            
+        if rng.random() < probability:
             return self.action(*args, **kwargs)
     # ---
 # --- Action
+
+
+
+class BatchAction:
+    """The bulk version of an action, performed on many cells at once.
+    
+    The cells are given as an array of slots of an array-backed lineage.
+    The probability is either numeric or a function of the slots that
+    returns an array with the probability of each cell, and the action
+    is a function that applies the behavior to the slots (already 
+    accepted) and returns the logged result of each of them, in order::
+    
+        >>> def mutate(slots):
+        ...     lineage.columns.set_genotypes(slots, new_genotypes(slots))
+        ...     return [CellView(lineage, slot) for slot in slots]
+        
+        >>> action = BatchAction(mutate, 
+        ...                      probability=lambda slots: p[slots], 
+        ...                      name='mutation')
+        
+        >>> accepted = slots[rng.random(len(slots)) < action.evaluate(slots)]
+        >>> action(accepted, log=log)
+    
+    When a log is given, the results are logged after the whole group 
+    is processed, so the ``preparefor`` step of the log sees the cells 
+    after the action (their index and father are not changed).
+    
+    """
+    __slots__ = ('unlogged', 'probability', 'name', 'prepare', 'lineage')
+
+    def __init__(self, action, probability=None, name=None, prepare=True):
+        """
+        Params:
+        
+            action (function): The bulk procedure, ``f(slots, ...)``.
+            
+            probability (optional numeric or function):
+                    The numeric probability or the probability function
+                    of the slots. Default is 1 (do always).
+                    
+            prepare (bool): Whether the log is prepared for each cell.
+                    
+        """
+        if probability is None:
+            probability = 1
+        
+        self.unlogged = action
+        self.probability = probability
+        self.name = name
+        self.prepare = prepare
+        self.lineage = None  # Bound when added to a lineage
+    # ---
+    
+    def __repr__(self):
+        return "{}(action={},probability={},name={})".format(self.__class__.__name__,
+                                                             self.unlogged,
+                                                             self.probability,
+                                                             self.name)
+    # ---
+    
+    def __str__(self):
+        return self.name
+    # ---
+    
+    def evaluate(self, slots):
+        """The probability of the action for each of the cells."""
+        if callable(self.probability):
+            return self.probability(slots)
+        return np.full(len(slots), self.probability)
+    # ---
+    
+    def __call__(self, slots, *args, log=None, **kwargs):
+        """Perform the action on the cells, logging the results."""
+        results = self.unlogged(slots, *args, **kwargs)
+        if not log or results is None:
+            return results
+        
+        # Deferred, the cells module depends on this one
+        from .cells import CellView
+        
+        name, lineage = self.name, self.lineage
+        for slot, result in zip(np.asarray(slots).tolist(), results):
+            if self.prepare:
+                log.preparefor(name, CellView(lineage, slot))
+            log.log(name, result)
+        return results
+    # ---
+    
+    def per_cell(self):
+        """An ``Action`` performing this one on a single cell."""
+        def first(results):
+            return None if results is None else results[0]
+        
+        def action(cell, *args, **kwargs):
+            return first(self(np.array([cell.slot]), *args, **kwargs))
+        
+        def unlogged(cell, *args, **kwargs):
+            return first(self.unlogged(np.array([cell.slot]), *args, **kwargs))
+        action.unlogged = unlogged
+        
+        def probability(cell):
+            return float(self.evaluate(np.array([cell.slot]))[0])
+        
+        return Action(action, probability, self.name)
+    # ---
+# --- BatchAction
+
+
+
+class BehaviorTable:
+    """An immutable, precompiled table of actions and their weights.
+
+    The table is shared by all the cells of a lineage. It holds the
+    normalized and cumulative weights of the actions and an alias table,
+    so that selecting an action takes O(1) no matter how many there are::
+
+        >>> table = BehaviorTable([eat, sleep], weights=[3, 1])
+        >>> table.choose()  # `eat` ~75% of the times
+        
+    """
+    __slots__ = ('actions', 'weights', 'normalized_weights', 
+                 'cumulative_weights', 'alias_table')
+
+    def __init__(self, actions=(), weights=None):
+        """
+        Params:
+        
+            actions (sequence of Action): The actions in the table.
+            
+            weights (optional sequence of numeric values): 
+                    The relative weights to select each action.
+                    Default is all actions have the same weight.
+                    
+        """
+        actions = tuple(actions)
+        if weights is None:
+            weights = [1] * len(actions)
+        if len(weights) != len(actions):
+            raise ValueError('Weights must correspond to behaviors one-to-one.')
+            
+        total = sum(weights)
+        normalized = np.array([w/total for w in weights], dtype=float)
+        cumulative = np.cumsum(normalized)
+        normalized.flags.writeable = False
+        cumulative.flags.writeable = False
+        
+        self.actions = actions
+        self.weights = tuple(weights)
+        self.normalized_weights = normalized
+        self.cumulative_weights = cumulative
+        self.alias_table = AliasTable(normalized) if actions else None
+    # ---
+    
+    def __len__(self):
+        return len(self.actions)
+    # ---
+    
+    def __iter__(self):
+        """Unpack as the pair ``(actions, normalized_weights)``."""
+        yield self.actions
+        yield self.normalized_weights
+    # ---
+    
+    def choose(self, rng=None):
+        """Select an action with the probability given by the weights."""
+        return self.actions[self.alias_table.draw(rng)]
+    # ---
+    
+    def sample(self, size, rng=None):
+        """Select the indices of `size` actions at once."""
+        return self.alias_table.sample(size, rng)
+    # ---
+# --- BehaviorTable
@@ -0,0 +1,119 @@
+"""
+
+Cell-cycle clocks.
+
+Instead of drawing every step whether each cell divides or dies, each
+cell draws at birth the time until it's next division, death, etc. from
+a distribution of durations, and the events are kept in a calendar
+queue. A step only touches the cells whose events are due in it, so the
+cost of the simulation follows the number of events, not the size of
+the population.
+
+"""
+
+import numpy as np
+
+from ..utils.calendar import CalendarQueue
+
+
+class CellCycleScheduler:
+    """Fires the behaviors of a lineage when the clocks of the cells ring.
+
+    Each clock is named after a behavior of the lineage and has a
+    distribution of waiting times, given as a function that draws an
+    array of `n` durations (in steps) from a ``RandomStream``::
+
+        >>> clocks = {'division': lambda n, rng: rng.gamma(8, 1/8, n),
+        ...           'death': lambda n, rng: rng.exponential(4, n)}
+
+    At birth, a cell starts one clock of each kind. When a clock rings,
+    the behavior is performed with it's usual probability (so that, for
+    instance, the death of the last cell can still be prevented) and, if
+    the cell is still alive, that clock is restarted. The clocks of a dead
+    cell are discarded. Behaviors without a clock are not performed.
+
+    """
+
+    # Number of durations drawn at once for each clock
+    block = 1024
+
+    def __init__(self, lineage, clocks, width=1.0):
+        """
+        Params:
+
+            lineage (CellLine): The lineage whose cells are scheduled.
+            clocks (dict): The function that draws the durations of each
+                    behavior, by name.
+            width (float): The span of time of the buckets of the queue.
+
+        """
+        self.lineage = lineage
+        self.clocks = dict(clocks)
+        self.queue = CalendarQueue(width)
+        self.now = 0.0
+        self.serials = {}  # Cell -> serial of it's current life
+        self._serial = 0
+        self._durations = {name: [] for name in self.clocks}
+    # ---
+
+    def __len__(self):
+        """Number of scheduled events (including discarded ones)."""
+        return len(self.queue)
+    # ---
+
+    def duration(self, name):
+        """Draw a waiting time for the clock (pre-drawn in blocks)."""
+        durations = self._durations[name]
+        if not durations:
+            block = np.asarray(self.clocks[name](self.block, self.lineage.rng),
+                               dtype=float)
+            durations.extend(block.tolist())
+        return durations.pop()
+    # ---
+
+    def start(self, cell, name, serial):
+        """Start a clock of the cell."""
+        self.queue.push(self.now + self.duration(name), (cell, name, serial))
+    # ---
+
+    def born(self, cell):
+        """Start all the clocks of a new cell."""
+        self._serial += 1
+        self.serials[cell] = self._serial
+        for name in self.clocks:
+            self.start(cell, name, self._serial)
+    # ---
+
+    def died(self, cell):
+        """Discard the clocks of a dead cell."""
+        self.serials.pop(cell, None)
+    # ---
+
+    def process(self, *args, time=None, log=None, **kwargs):
+        """Fire the events due before the end of the step."""
+        if time is None:
+            time = int(self.now)
+        self.now = max(self.now, time)
+
+        actions = {action.name: action
+                   for action in self.lineage.behavior_table.actions}
+        serials = self.serials
+        rng = self.lineage.rng
+        for due, (cell, name, serial) in self.queue.pop_until(time + 1):
+            if serials.get(cell) != serial:
+                # A clock of a dead cell
+                continue
+            self.now = due
+
+            action = actions[name]
+            if rng.random() < action.evaluate(cell):
+                if log is None:
+                    action.unlogged(cell, *args, time=time, **kwargs)
+                else:
+                    action.action(cell, *args, time=time, log=log, **kwargs)
+
+            if serials.get(cell) == serial:
+                self.start(cell, name, serial)
+        self.now = time + 1
+    # ---
+# --- CellCycleScheduler
@@ -4,11 +4,19 @@ Structures representing the biological entities.
 """
 
 import numpy as np
-import random
 from functools import wraps
 
 from ..logging import logged
-from .action import Action
+from ..utils.indexed import IndexedSet
+from ..utils.rng import RandomStream
+from .action import Action, BatchAction, BehaviorTable
+from .population import CellColumns
+from .genotypes import GenotypeTable
+from .traits import TraitTable
+from .gillespie import GillespieEngine
+from .hybrid import HybridEngine
+from .cellcycle import CellCycleScheduler
+from .kernels import choose_actions
 
 
 
@@ -39,46 +47,64 @@ def behavior(actionname, actionfn=None, probability=None, prepare=True):
         # Used as a decorator
         return make_behavior    
 # ---
+
+
+def batch_behavior(actionname, actionfn=None, probability=None, prepare=True):
+    """Assemble the bulk version of a cell behavior.
     
+    The action receives the array of slots of the cells that chose and
+    accepted the behavior, applies it to all of them at once and returns
+    what is logged for each cell (the cell itself, the daughters, etc.).
+    The probability, if a function, receives the array of slots of the
+    cells that chose the behavior and returns an array of probabilities.
+    See ``BatchAction``.
     
-
-class Cell:
+    Can be used as a function decorator or as a normal function.
     """
-    A single cell.
-
-    It acts according to it's state, and the states of nearby cells and sites.
-
-    Attributes:
-        + Index: A label that identifies it among others in the
-                 same lineage.
-        + Father: The index (lineage label) of it's father.
-        + CellLine: The lineage this cell belongs to.
-        + Site: The place in the grid this cell inhabits in.
-        + Mutations: The mutations in this cell relative to the cell
-                     lineage's reference
+    # Auxiliary function
+    def make_behavior(actionfn):
+        """Decorated action."""
+        return BatchAction(actionfn, 
+                           probability, 
+                           actionname, 
+                           prepare=prepare)
+    # ---
+    
+    if actionfn:
+        # Used as a function
+        return make_behavior(actionfn)
+    else:
+        # Used as a decorator
+        return make_behavior
+# ---
+    
+    
 
+class BaseCell:
     """
+    The behavior shared by the cells, whatever their storage.
 
-    def __init__(self, lineage, index):
-        """Create a new cell.
+    Holds no state: the subclasses keep the index, lineage, father, site
+    and genotype of the cell (see ``Cell`` and ``CellView``).
 
-        Parameters:
-            :param cell_line: The lineage this cell belongs to.
-            :param index: The ID of this cell in the lineage.
+    """
+    __slots__ = ()
 
-        """
-        self.index = index
-        self.lineage = lineage
-        self.father = None
-        self.site = None
-        self.actions = self.lineage.fetch_behaviors()
-        self.mutations = []
+    @property
+    def actions(self):
+        """The behaviors of the cell (the table shared by the lineage)."""
+        return self.lineage.behavior_table
     # ---
 
     @property
-    def coordinates(self):
-        """Coordinates of the site that the cell inhabits."""
-        return self.site.coordinates
+    def history(self):
+        """The mutation history of the cell (see ``MutationHistory``)."""
+        return self.lineage.genotypes.history(self.genotype)
+
+    @history.setter
+    def history(self, value):
+        self.genotype = self.lineage.genotypes.intern(value)
+    # ---
 
     @property
     def mutations(self):
@@ -87,12 +113,12 @@ class Cell:
         The mutations are relative to the ancestral genome.
 
         """
-        return self._mutations
+        return self.lineage.genotypes.mutations(self.genotype)
 
     @mutations.setter
     def mutations(self, value):
         """Setter for the cell's mutations."""
-        self._mutations = list(value)  # COPY
+        self.genotype = self.lineage.genotypes.intern(value)
     # ---
 
     @property
@@ -105,18 +131,11 @@ class Cell:
     def genome(self):
         """Genome of the cell.
 
-        It is assembled from the cell's ancestral genome and it's mutations.
+        It is assembled from the cell's ancestral genome and it's mutations
+        once per genotype, and then cached by the lineage.
 
         """
-        # Get the original genome
-        bases = list(self.ancestral_genome)
-        # Add mutations one by one
-        for position, mutated in self.mutations:
-            bases[position] = mutated
-        # Assemble the final genome
-        genome = ''.join(bases)
-
-        return genome
+        return self.lineage.genotypes.genome(self.genotype)
     # ---
     
     @property
@@ -130,6 +149,14 @@ class Cell:
         return self.lineage.genome_alphabet
     # ---
 
+    def trait(self, name):
+        """The value of a heritable trait of the cell (see ``TraitTable``)."""
+        traits = self.lineage.genotypes.traits
+        if traits is None:
+            raise ValueError('The lineage has no traits.')
+        return traits.value(self.genotype, name)
+    # ---
+
     def initialize(self, site=None, father=None, mutations=None):
         """Initialize grid site, mutations and father."""
         if site:
@@ -137,7 +164,7 @@ class Cell:
         if father:
             self.father = father
         if mutations:
-            self.mutations = mutations  # copy
+            self.mutations = mutations
     # ---
     
     def add_mutation(self, position, mutated):
@@ -147,30 +174,47 @@ class Cell:
         mutations may not represent SNPs.
         """
         mutation = (position, mutated)
-        self.mutations.append(mutation)
+        self.genotype = self.lineage.genotypes.derive(self.genotype, mutation)
+    # ---
+    
+    def add_novel_mutation(self):
+        """Add a mutation at a brand new site (infinite-sites model).
+        
+        Return the id of the new mutation.
+        """
+        genotypes = self.lineage.genotypes
+        self.genotype = genotypes.derive_novel(self.genotype)
+        return genotypes.mutation(self.genotype)
     # ---
 
     def new_daughter(self):
         """Initialize a new daughter cell.
 
-        Initialize with father and mutation attributes.
+        Initialize with father and mutation attributes. The daughter
+        shares the genotype of it's father, nothing is copied.
 
         """
         daughter = self.lineage.new_cell()
-        daughter.initialize( father=self.index,
-                             mutations=self.mutations )
+        daughter.initialize( father=self.index )
+        daughter.genotype = self.genotype
         return daughter
     # ---
 
     def add_to(self, site):
         """Add the cell to the site."""
-        self.site = site
         site.add_guest(self)
     # ---    
     
-    def choose_action(self, actions, weights):
-        "Select an action with the probability given by the weights."
-        r = random.random()
+    def choose_action(self, actions=None, weights=None):
+        """Select an action with the probability given by the weights.
+        
+        By default, one of the behaviors of the cell (see ``_choose_action``).
+        
+        """
+        if actions is None:
+            return self._choose_action()
+        
+        r = self.lineage.rng.random()
         sum = 0
         
         for w, action in zip(weights, actions):
@@ -179,21 +223,179 @@ class Cell:
                 break
         return action
     # ---   
+    
+    def _choose_action(self, table=None):
+        "Select an action with the probability given by the behavior table."
+        if table is None:
+            table = self.actions
+        return table.choose(self.lineage.rng)
+    # ---
 
     def process(self, *args, **kwargs):
         """Select an action and perform it."""
-        # Select an action
-        actions, weights = self.actions
-        action = self.choose_action(actions, weights)
+        # Select an action and perform it according 
+        # to it's respective probability
+        self._choose_action().perform(self, *args, rng=self.lineage.rng, 
+                                      **kwargs)
+    # ---
+# --- BaseCell
+
+
+
+class Cell(BaseCell):
+    """
+    A single cell.
+
+    It acts according to it's state, and the states of nearby cells and sites.
+
+    Attributes:
+        + Index: A label that identifies it among others in the
+                 same lineage.
+        + Father: The index (lineage label) of it's father.
+        + CellLine: The lineage this cell belongs to.
+        + Site: The place in the grid this cell inhabits in.
+        + Genotype: The id of the cell's genotype in the lineage's
+                    genotype table. It determines the mutations of the
+                    cell relative to the cell lineage's reference.
+
+    """
+    __slots__ = ('index', 'lineage', 'father', 'site', '_genotype')
+
+    def __init__(self, lineage, index=None):
+        """Create a new cell.
+
+        Parameters:
+            :param cell_line: The lineage this cell belongs to.
+            :param index: The ID of this cell in the lineage.
+
+        """
+        self.index = index
+        self.lineage = lineage
+        self.father = None
+        self.site = None
+        self._genotype = 0
+    # ---
+
+    @property
+    def coordinates(self):
+        """Coordinates of the site that the cell inhabits."""
+        return self.site.coordinates
+
+    @property
+    def genotype(self):
+        """The id of this cell's genotype in the lineage."""
+        return self._genotype
+
+    @genotype.setter
+    def genotype(self, value):
+        self.lineage.genotypes.move_cell(self._genotype, value)
+        self._genotype = value
+    # ---
+
+    def reset(self, index):
+        """Clear the state of the cell to reuse it with a new index.
+        
+        No new objects are allocated.
         
-        # Perform the action according to it's respective probability
-        p = action.probability(self)
-        action.try_action(self, *args, probability=p, **kwargs)
+        """
+        self.index = index
+        self.father = None
+        self.site = None
+        self._genotype = 0
     # ---
 # --- Cell
 
 
 
+class CellView(BaseCell):
+    """
+    A lightweight view of a cell from an array-backed lineage.
+
+    The state of the cell lives in the columns of the lineage (see
+    ``CellColumns``), the view only knows the row ("slot") that holds it.
+    Views are created on demand and behave as regular cells, two views
+    of the same slot compare equal. Sites do not keep the views as 
+    guests, the columns record the site of each cell.
+
+    """
+    __slots__ = ('lineage', 'slot')
+
+    def __init__(self, lineage, slot):
+        """Create a view of the cell stored in the given slot."""
+        self.lineage = lineage
+        self.slot = slot
+    # ---
+
+    def __eq__(self, other):
+        return (isinstance(other, CellView)
+                and self.slot == other.slot
+                and self.lineage is other.lineage)
+    # ---
+
+    def __hash__(self):
+        return hash((id(self.lineage), self.slot))
+    # ---
+
+    def __repr__(self):
+        return "{}(index={}, slot={})".format(self.__class__.__name__,
+                                              self.index,
+                                              self.slot)
+    # ---
+
+    @property
+    def index(self):
+        """The ID of this cell in the lineage."""
+        return int(self.lineage.columns.index[self.slot])
+
+    @index.setter
+    def index(self, value):
+        self.lineage.columns.index[self.slot] = value
+    # ---
+
+    @property
+    def father(self):
+        """The index of this cell's father (None if unknown)."""
+        father = int(self.lineage.columns.father[self.slot])
+        return None if father < 0 else father
+
+    @father.setter
+    def father(self, value):
+        self.lineage.columns.father[self.slot] = -1 if value is None else value
+    # ---
+
+    @property
+    def site(self):
+        """The site this cell inhabits.
+        
+        Setting it moves the cell to the site (see ``CellColumns.place``).
+        
+        """
+        return self.lineage.columns.site_of(self.slot)
+
+    @site.setter
+    def site(self, value):
+        self.lineage.columns.place(self.slot, value)
+    # ---
+
+    @property
+    def coordinates(self):
+        """Coordinates of the site that the cell inhabits."""
+        return tuple(self.lineage.columns.coordinates[self.slot].tolist())
+    # ---
+
+    @property
+    def genotype(self):
+        """The id of this cell's genotype in the lineage."""
+        return int(self.lineage.columns.genotype[self.slot])
+
+    @genotype.setter
+    def genotype(self, value):
+        self.lineage.columns.set_genotype(self.slot, value)
+    # ---
+# --- CellView
+
+
+
 class CellLine:
     """
     Handles the specimens of a specific cell lineage.
@@ -205,18 +407,32 @@ class CellLine:
 
     Atributes:
             + Ancestral genome: A string-like object.
-            + Cells: The cells inherited from this cell line.
+            + Cells: The pool of cell objects of this cell line (alive, dead
+                     and preallocated ones).
             + Alive/Dead cells.
             + Current cell index: Each cell has a unique index. This is the
                                   index to place in the next cell to be born.
 
     """
+    # Number of cells preallocated each time the pool runs out
+    pool_chunk = 256
 
     def __init__(self,
                  *args,
                  genome=None,
                  genome_alphabet=None,
                  recycle_dead=True,
+                 array_backed=False,
+                 batched=False,
+                 synchronous=False,
+                 infinite_sites=False,
+                 continuous_time=False,
+                 hybrid=False,
+                 min_density=1,
+                 clocks=None,
+                 traits=None,
+                 trait_effect=None,
+                 rng=None,
                  **kwargs):
         """Creation of a cell lineage.
 
@@ -225,19 +441,90 @@ class CellLine:
                             base genome of the cells from this line.
             :param recycle_dead: (default True) Repurpose dead cells when needed,
                                  this helps improve memory usage.
+            :param array_backed: (default False) Store the cells as NumPy
+                                 columns instead of one object per cell.
+                                 Cells are then handled through
+                                 lightweight views (see ``CellView``).
+            :param batched: (default False) Process the whole population at
+                            once on each step (see ``process_batch``).
+                            Requires an array-backed lineage.
+            :param synchronous: (default False) Process the whole 
+                                population at once, with every cell 
+                                deciding it's behavior against the state
+                                at the start of the step (see
+                                ``process_synchronous``). Requires an
+                                array-backed lineage.
+            :param infinite_sites: (default False) Use the infinite-sites
+                                   mutation model: each mutation hits a new
+                                   site and gets a unique id, genomes are
+                                   not assembled as sequences.
+            :param continuous_time: (default False) Process the cells one
+                                    event at a time in continuous time 
+                                    instead of in discrete steps (see 
+                                    ``GillespieEngine``).
+            :param hybrid: (default False) Keep the cells of the dense 
+                           interior as clone counts per site, only the 
+                           cells of the boundary are processed as 
+                           individuals (see ``HybridEngine``).
+            :param min_density: (default 1) Number of cells that make a 
+                                site dense, for the hybrid dynamics.
+            :param clocks: (default None) A mapping of behavior names to 
+                           functions drawing their waiting times. If 
+                           given, the behaviors are performed when the
+                           clocks of the cells ring instead of on each
+                           step (see ``CellCycleScheduler``).
+            :param traits: (default None) A mapping of the names of 
+                           heritable numeric traits to their ancestral
+                           values (see ``TraitTable``).
+            :param trait_effect: (default None) Function drawing the 
+                                 traits of a new genotype from the ones
+                                 of it's parent, ``f(values, rng)``. By
+                                 default traits are inherited unchanged.
+            :param rng: (default a fresh stream) The ``RandomStream`` the
+                        cells draw from. A system hands out it's own 
+                        streams to the lineages it holds.
 
             If a custom genome is passed, the genome alphabet should be
             passed too unless it is formed of the letters in "ACGT".
             
         """
         self.recycle_dead = recycle_dead
+        self._rng = RandomStream() if rng is None else rng
         self.current_index = 0
         self.cells = []
-        self.alive_cells = set()
-        self.dead_cells = set()
+        self.blank_cells = []
+        self.alive_cells = IndexedSet()
+        self.dead_cells = []
         self.behaviors = {'actions': [],
                           'weights': [],
                           'normalized_weights': []}
+        self.behavior_table = BehaviorTable()
+        self.batch_behaviors = {}
+        self.aggregate_behaviors = {}
+        
+        if batched and not array_backed:
+            raise ValueError('Batched steps require an array-backed lineage.')
+        self.batched = batched
+        
+        if synchronous and not array_backed:
+            raise ValueError('Synchronous steps require an array-backed lineage.')
+        self.synchronous = synchronous
+        
+        if (batched or synchronous) and continuous_time:
+            raise ValueError('Batched steps and continuous time are exclusive.')
+        self.engine = GillespieEngine(self) if continuous_time else None
+        
+        if hybrid and continuous_time:
+            raise ValueError('Hybrid dynamics and continuous time are exclusive.')
+        self.hybrid = HybridEngine(self, min_density) if hybrid else None
+        
+        if clocks and (batched or synchronous or continuous_time or hybrid):
+            raise ValueError('Cell-cycle clocks exclude the other dynamics.')
+        self.scheduler = CellCycleScheduler(self, clocks) if clocks else None
+        
+        # Engines that follow the births and deaths of the cells
+        self.trackers = [tracker for tracker in (self.engine, self.scheduler)
+                                 if tracker is not None]
         
         if genome is None:
             genome = 10 * 'A'
@@ -246,11 +533,169 @@ class CellLine:
         if genome_alphabet is None:
             genome_alphabet = 'AGCT'
         self.genome_alphabet = genome_alphabet
+        
+        # The distinct genotypes of the cells, and their traits
+        if traits:
+            traits = TraitTable(traits, trait_effect, rng=self._rng)
+        else:
+            traits = None
+        self.genotypes = GenotypeTable(genome, infinite_sites=infinite_sites,
+                                       traits=traits)
+        
+        if array_backed:
+            self.columns = CellColumns(genotypes=self.genotypes, lineage=self)
+        else:
+            self.columns = None
     # ---
         
+    @property
+    def array_backed(self):
+        """Whether the cells are stored in NumPy columns."""
+        return self.columns is not None
+    # ---
+
+    @property
+    def infinite_sites(self):
+        """Whether the cells follow the infinite-sites mutation model."""
+        return self.genotypes.infinite_sites
+    # ---
+
+    @property
+    def rng(self):
+        """The ``RandomStream`` the cells draw from."""
+        return self._rng
+    # ---
+
+    @rng.setter
+    def rng(self, rng):
+        self._rng = rng
+        if self.traits is not None:
+            self.traits.rng = rng
+    # ---
+
+    @property
+    def traits(self):
+        """The heritable traits of the genotypes (None if there are none)."""
+        return self.genotypes.traits
+    # ---
+
+    def trait_values(self, name, slots=None):
+        """The values of a trait for a group of cells, as an array.
+
+        The cells are given by an array of slots (array-backed lineages
+        only), by default all the alive cells in the order of
+        ``alive_genotypes``.
+
+        """
+        if self.traits is None:
+            raise ValueError('The lineage has no traits.')
+        if slots is None:
+            _, genotypes = self.alive_genotypes()
+        else:
+            genotypes = self.columns.genotype[slots]
+        return self.traits.of(genotypes, name)
+    # ---
+
     @property
     def total_cells(self):
-        return len(self.alive_cells)
+        if self.columns is not None:
+            agents = self.columns.alive_count
+        else:
+            agents = len(self.alive_cells)
+        if self.hybrid is not None:
+            return agents + self.hybrid.aggregated_cells
+        return agents
+    # ---
+    
+    def clone_sizes(self):
+        """Map each genotype with alive cells to the number of them."""
+        return self.genotypes.clone_sizes()
+    # ---
+    
+    def alive_genotypes(self):
+        """The indices and the genotypes of the alive cells, as arrays."""
+        if self.columns is not None:
+            slots = self.columns.alive_slots
+            return self.columns.index[slots], self.columns.genotype[slots]
+        
+        cells = list(self.alive_cells)
+        indices = np.fromiter((c.index for c in cells), dtype=np.int64, 
+                              count=len(cells))
+        genotypes = np.fromiter((c.genotype for c in cells), dtype=np.int64,
+                                count=len(cells))
+        return indices, genotypes
+    # ---
+    
+    def genome_matrix(self, cells=None):
+        """The genomes of the cells as an (n_cells x genome length) matrix.
+        
+        The entries are `uint8` codes, the positions of the bases in the
+        genome alphabet. Default is all the alive cells, in the order 
+        given by ``alive_genotypes``.
+        
+        """
+        if cells is None:
+            _, genotypes = self.alive_genotypes()
+        else:
+            genotypes = [cell.genotype for cell in cells]
+        return self.genotypes.genome_matrix(genotypes, self.genome_alphabet)
+    # ---
+    
+    def iter_genome_matrix(self, chunk_size=10000):
+        """Stream the genome matrix of the alive cells in row chunks.
+        
+        Yields pairs ``(indices, matrix)`` with the indices of the cells
+        and their genomes (see ``genome_matrix``), at most `chunk_size`
+        cells at a time.
+        
+        """
+        indices, genotypes = self.alive_genotypes()
+        
+        # Assemble each distinct genome only once
+        distinct, inverse = np.unique(genotypes, return_inverse=True)
+        rows = self.genotypes.genome_matrix(distinct, self.genome_alphabet)
+        inverse = inverse.ravel()
+        
+        for start in range(0, len(indices), chunk_size):
+            end = start + chunk_size
+            yield indices[start:end], rows[inverse[start:end]]
+    # ---
+    
+    def write_fasta(self, file, chunk_size=10000):
+        """Write the genomes of the alive cells to a FASTA file.
+        
+        :param file: A path or a writable text file object.
+        
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                return self.write_fasta(f, chunk_size)
+        
+        alphabet = np.array([ord(base) for base in self.genome_alphabet],
+                            dtype=np.uint8)
+        for indices, matrix in self.iter_genome_matrix(chunk_size):
+            sequences = alphabet[matrix]
+            for index, sequence in zip(indices.tolist(), sequences):
+                file.write('>{}\n{}\n'.format(index, 
+                                               sequence.tobytes().decode()))
+    # ---
+    
+    def shared_mutations(self, cell, other):
+        """The ids of the mutations two cells have in common.
+        
+        Only valid in the infinite-sites model.
+        
+        """
+        return self.genotypes.shared_mutations(cell.genotype, other.genotype)
+    # ---
+    
+    def allele_frequencies(self):
+        """Fraction of the alive cells carrying each mutation, by id.
+        
+        Only valid in the infinite-sites model.
+        
+        """
+        return self.genotypes.allele_frequencies()
     # ---
     
     def fetch_behaviors(self):
@@ -260,14 +705,17 @@ class CellLine:
                  list(self.behaviors['normalized_weights']) )
     # ---
     
-    def add_behaviors(self, behaviors, weights=None):
+    def add_behaviors(self, behaviors, weights=None, batch=None):
         """Add the behaviors defining the cells from this cell line.
         
         Params:
            
             behaviors (list of callables):
                 The list of actions that the cells in this
-                lineage will be able to perform.
+                lineage will be able to perform. Bulk behaviors (see 
+                ``batch_behavior``) are accepted too, they are performed 
+                at once on the cells that chose them in batched steps, 
+                and on each cell by itself otherwise.
                
             weights (optional list of numeric values):
                 The list of relative weights for selecting each action.
@@ -276,10 +724,16 @@ class CellLine:
                 selected by the cell at each step. default is all actions
                 have the same weights.
                 
+            batch (optional list of BatchAction):
+                Bulk counterparts of some of the behaviors, matched by 
+                name, used instead of them in batched steps.
+                
         Raises:
             
             ValueError:
-                If the weights are not of the same length as the behaviors.
+                If the weights are not of the same length as the behaviors,
+                or if bulk behaviors are given to a lineage that is not 
+                array-backed.
             
         """
         if weights:
@@ -288,6 +742,18 @@ class CellLine:
         else:
             # All actions have the same weight
             weights = [1] * len(behaviors)
+        
+        bulk = [b for b in behaviors if isinstance(b, BatchAction)]
+        bulk += batch or []
+        if bulk and not self.array_backed:
+            raise ValueError('Bulk behaviors require an array-backed lineage.')
+        for action in bulk:
+            action.lineage = self
+            self.batch_behaviors[action.name] = (action.evaluate, action)
+        
+        # Bulk behaviors are also performed cell by cell
+        behaviors = [b.per_cell() if isinstance(b, BatchAction) else b
+                     for b in behaviors]
             
         self.behaviors['actions'] += behaviors
         self.behaviors['weights'] += weights
@@ -296,27 +762,54 @@ class CellLine:
         all_weights = self.behaviors['weights']
         total_w = sum(all_weights)
         self.behaviors['normalized_weights'] = [w/total_w for w in all_weights]
+        
+        # Compile the table shared by the cells
+        self.behavior_table = BehaviorTable(self.behaviors['actions'],
+                                            all_weights)
     # ---
 
     def new_cell(self):
         "Get a new blank cell in this lineage and system."
+        if self.columns is not None:
+            # Reserve a row in the columns
+            slot = self.columns.allocate(self.current_index,
+                                         reuse=self.recycle_dead)
+            self.current_index += 1
+            new = CellView(self, slot)
+            for tracker in self.trackers:
+                tracker.born(new)
+            return new
+
         # Fetch a blank cell
         if self.recycle_dead and self.dead_cells:
             # Fetch a dead cell to recycle
             new = self.cell_to_recycle()
-            self.recycle_cell(new)
         else:
-            # Fetch a fresh, new cell
-            new = Cell( lineage = self,
-                        index = self.current_index )
-            self.current_index += 1
-            self.cells.append(new)
+            # Fetch a fresh cell from the pool
+            new = self.blank_cell()
+        self.recycle_cell(new)
 
         # Update state to take new cell into account
         self.alive_cells.add(new)
+        self.genotypes.add_cells(new.genotype)
+        for tracker in self.trackers:
+            tracker.born(new)
         return new
     # ---
 
+    def blank_cell(self):
+        """Return a never used cell from the pool.
+        
+        The pool grows in chunks of ``pool_chunk`` cells.
+        
+        """
+        if not self.blank_cells:
+            chunk = [Cell(self) for _ in range(self.pool_chunk)]
+            self.cells.extend(chunk)
+            self.blank_cells = chunk[::-1]
+        return self.blank_cells.pop()
+    # ---
+
     def cell_to_recycle(self):
         """Return a cell from the dead ones."""
         recycle = self.dead_cells.pop()
@@ -325,11 +818,18 @@ class CellLine:
 
     def recycle_cell(self, cell):
         """Clear previous information from a cell."""
-        # Place new ID
-        cell.index = self.current_index
+        # Reset the state and place new ID
+        cell.reset(self.current_index)
         self.current_index += 1
     # ---
 
+    def is_alive(self, cell):
+        """Whether the cell is alive."""
+        if self.columns is not None:
+            return bool(self.columns.alive[cell.slot])
+        return cell in self.alive_cells
+    # ---
+
     def sample(self, all=False, n=1):
         """Take a sample of alive cells.
 
@@ -339,12 +839,62 @@ class CellLine:
                   container.
 
         """
-        # If it is asked for all cells,
-        # take a sample of the whole size
         if all:
-            n = len(self.alive_cells)
+            return list(self.iter_alive())
+        
+        if self.columns is not None:
+            slots = self.columns.living.sample(n, self.rng)
+            return [CellView(self, slot) for slot in slots.tolist()]
+        
         # Return a sample of size n
-        return random.sample(self.alive_cells, n)
+        return self.alive_cells.sample(n, self.rng)
+    # ---
+    
+    def iter_alive(self):
+        """Iterate the currently alive cells in random order.
+        
+        Cells born or dead during the iteration do not alter it.
+        
+        """
+        if self.columns is not None:
+            slots = self.columns.living.permutation(self.rng)
+            return (CellView(self, slot) for slot in slots.tolist())
+        
+        return self.alive_cells.permutation(self.rng)
+    # ---
+
+    def cells_at(self, site):
+        """The alive cells of the lineage in the site, by index."""
+        if self.columns is not None:
+            slots = self.columns.slots_at(site)
+            slots = slots[np.argsort(self.columns.index[slots])]
+            return [CellView(self, slot) for slot in slots.tolist()]
+        
+        return sorted((guest for guest in site.guests
+                             if guest.lineage is self),
+                      key=lambda cell: cell.index)
+    # ---
+    
+    def cells_by_site(self):
+        """Map each site with alive cells of the lineage to them, by index.
+        
+        The sites are found in a single pass over the cells.
+        
+        """
+        if self.columns is not None:
+            columns = self.columns
+            slots = columns.alive_slots
+            slots = slots[np.argsort(columns.index[slots])]
+            sites = columns.world.sites_at(columns.coordinates[slots])
+            cells = [CellView(self, slot) for slot in slots.tolist()]
+        else:
+            cells = sorted(self.alive_cells, key=lambda cell: cell.index)
+            sites = [cell.site for cell in cells]
+        
+        grouped = {}
+        for site, cell in zip(sites, cells):
+            grouped.setdefault(site, []).append(cell)
+        return grouped
     # ---
 
     def handle_death(self, dying):
@@ -354,13 +904,146 @@ class CellLine:
         maybe to recycle it when another is born.
 
         """
+        for tracker in self.trackers:
+            tracker.died(dying)
+        if self.columns is not None:
+            self.columns.release(dying.slot)
+            return
         self.alive_cells.remove(dying)
-        self.dead_cells.add(dying)
+        self.dead_cells.append(dying)
+        self.genotypes.remove_cells(dying.genotype)
     # ---
         
     def process(self, *args, **kwargs):
         'Move a step forward in time.'
-        for cell in self.sample(all=True):
+        if self.engine is not None:
+            return self.engine.run_for(1, *args, **kwargs)
+        if self.hybrid is not None:
+            return self.hybrid.process(*args, **kwargs)
+        if self.scheduler is not None:
+            return self.scheduler.process(*args, **kwargs)
+        return self.process_agents(*args, **kwargs)
+    # ---
+    
+    def process_agents(self, *args, **kwargs):
+        'Move the individually tracked cells a step forward in time.'
+        if self.synchronous:
+            return self.process_synchronous(*args, **kwargs)
+        if self.batched:
+            return self.process_batch(*args, **kwargs)
+            
+        for cell in self.iter_alive():
             cell.process(*args, **kwargs)
     # ---
+    
+    def process_batch(self, *args, log=None, **kwargs):
+        """Move a step forward in time processing all the cells at once.
+        
+        The action choice and the acceptance draw of every alive cell are
+        made in single NumPy calls, then the cells are grouped by the chosen
+        action and each group is applied in the order the behaviors were
+        added. 
+        
+        A behavior with a bulk counterpart in ``batch_behaviors`` (a mapping 
+        of the behavior name to a pair ``(probability, action)`` of functions
+        receiving the array of slots of the cells, see ``batch_behavior`` 
+        for the usual way to register them) is applied to the whole group 
+        at once, else, the behavior is tried cell by cell.
+        
+        """
+        slots = self.columns.alive_slots
+        n = len(slots)
+        if not n:
+            return
+        
+        table = self.behavior_table
+        actions = table.actions
+        
+        # Draw everything at once
+        choices = table.sample(n, self.rng)
+        draws = self.rng.random(n)
+        
+        for k, action in enumerate(actions):
+            chosen = choices == k
+            group = slots[chosen]
+            if not len(group):
+                continue
+            
+            batch = self.batch_behaviors.get(action.name)
+            if batch:
+                # Apply in bulk
+                probability, actionfn = batch
+                accepted = group[draws[chosen] < probability(group)]
+                if len(accepted):
+                    actionfn(accepted, *args, log=log, **kwargs)
+            else:
+                # Fall back to the behavior of each cell
+                for slot, u in zip(group.tolist(), draws[chosen].tolist()):
+                    cell = CellView(self, slot)
+                    if u < action.evaluate(cell):
+                        action(cell, *args, log=log, **kwargs)
+    # ---
+    
+    def process_synchronous(self, *args, log=None, **kwargs):
+        """Move a step forward in time updating all the cells at once.
+        
+        As in ``process_batch``, the choices and acceptance draws of all
+        the cells are made at once (see ``kernels``), but the 
+        probabilities of every group are evaluated before any behavior
+        is applied, so that all the cells decide against the state at 
+        the start of the step. The accepted cells 
+        are then applied by ``apply_synchronous``.
+        
+        """
+        slots = self.columns.alive_slots
+        n = len(slots)
+        if not n:
+            return
+        
+        table = self.behavior_table
+        
+        # Draw everything at once
+        choices = choose_actions(table.cumulative_weights, self.rng.random(n))
+        draws = self.rng.random(n)
+        
+        # Decide against the current state
+        accepted = []
+        for k, action in enumerate(table.actions):
+            chosen = choices == k
+            group = slots[chosen]
+            if not len(group):
+                accepted.append(group)
+                continue
+            
+            batch = self.batch_behaviors.get(action.name)
+            if batch:
+                probabilities = batch[0](group)
+            else:
+                probabilities = np.array([action.evaluate(CellView(self, slot))
+                                          for slot in group.tolist()])
+            accepted.append(group[draws[chosen] < probabilities])
+        
+        self.apply_synchronous(accepted, *args, log=log, **kwargs)
+    # ---
+    
+    def apply_synchronous(self, accepted, *args, log=None, **kwargs):
+        """Apply the behaviors accepted in a synchronous step.
+        
+        `accepted` holds the array of slots of the cells that took each 
+        behavior, in the order of the behavior table. By default each 
+        group is applied in that order, in bulk if possible. Subclasses 
+        may override this to resolve the conflicts between the groups.
+        
+        """
+        for action, group in zip(self.behavior_table.actions, accepted):
+            if not len(group):
+                continue
+            
+            batch = self.batch_behaviors.get(action.name)
+            if batch:
+                batch[1](group, *args, log=log, **kwargs)
+            else:
+                for slot in group.tolist():
+                    action(CellView(self, slot), *args, log=log, **kwargs)
+    # ---
 # --- CellLine
@@ -0,0 +1,303 @@
+"""
+
+Clone-level dynamics without space.
+
+When only the clone sizes and the mutation tree matter, there is no
+need to track each cell nor the sites they inhabit. A clone population
+works directly on the counts of a ``GenotypeTable`` and advances them
+with tau-leaping: in each leap, the births, deaths and mutations of the
+big clones are drawn at once as Poisson and binomial variates, while the
+small ones are simulated exactly, one event at a time.
+
+"""
+
+import numpy as np
+
+from .genotypes import GenotypeTable
+from .mutations import MutationKernel
+from ..utils.rng import RandomStream
+
+
+class ClonePopulation:
+    """A population of cells tracked only by it's clone sizes.
+
+    Each cell divides at rate `birth_rate` and dies at rate `death_rate`,
+    and each daughter of a division acquires a Poisson distributed number
+    of mutations with mean `mutation_rate` (see ``MutationKernel``). A
+    daughter that mutates founds a new clone.
+
+    The time is advanced in leaps whose size adapts to the population
+    (Cao, Gillespie and Petzold's selection): each leap is as long as
+    possible while the expected change of every big clone stays below a
+    fraction `epsilon` of it's size. In a leap, the births and deaths of
+    a big clone are independent Poisson variates, with means given by
+    the rates and the time lived by the cells of the clone in the leap
+    (see ``exposure``). The clones below `critical_size` cells, for which a leap 
+    would be too coarse (and which may go extinct), are advanced through
+    the leap event by event, all of them at once.
+
+    The cost of a leap follows the number of alive clones, not the 
+    number of cells: only the mutations that found new clones are 
+    registered one at a time (see ``MutationKernel.mutate``). With a 
+    low `mutation_rate` (say 1e-4) a few hundred clones reach 1e8 cells
+    and beyond in under a second, while at the default rate hundreds of
+    thousands of clones appear on the way, and each leap draws for all
+    of them.
+
+    The creation and extinction of clones are emitted to the log as the
+    'newclone' and 'extinction' actions, with the population and the
+    genotype id as arguments (see ``CloneLog``).
+
+    Example::
+
+        >>> clones = ClonePopulation(birth_rate=1, death_rate=0.5)
+        >>> clones.seed()
+        >>> clones.run_for(20)
+
+        # About e^(0.5*20) cells, on average
+        >>> clones.total_cells
+
+    """
+
+    def __init__(self, *args,
+                       genome=None,
+                       genome_alphabet=None,
+                       genotypes=None,
+                       birth_rate=1.0,
+                       death_rate=0.5,
+                       mutation_rate=0.01,
+                       position_rates=None,
+                       base_weights=None,
+                       infinite_sites=False,
+                       epsilon=0.03,
+                       critical_size=None,
+                       rng=None,
+                       **kwargs):
+        """
+        Params:
+
+            genome (str): (default 'AAAAAAAAAA') The ancestral genome.
+            genome_alphabet (str): (default 'AGCT') The possible bases.
+            genotypes (optional GenotypeTable): Continue from the clones of
+                    an existing table (e.g. the one of a ``CellLine``),
+                    instead of creating a new one.
+            birth_rate, death_rate (float): Per cell rates of division and
+                    death.
+            mutation_rate (float): Mean number of mutations per daughter.
+            position_rates, base_weights: See ``MutationKernel``.
+            infinite_sites (bool): Use the infinite-sites mutation model.
+            epsilon (float): Bound on the relative change of the clones
+                    in a leap.
+            critical_size (int): (default 10/epsilon) Clones with fewer 
+                    cells are simulated exactly.
+            rng (optional RandomStream): The stream to draw from.
+
+        """
+        if genotypes is None:
+            if genome is None:
+                genome = 10 * 'A'
+            genotypes = GenotypeTable(genome, infinite_sites=infinite_sites)
+        self.genotypes = genotypes
+        self.genome = genotypes.ancestral_genome
+
+        if genome_alphabet is None:
+            genome_alphabet = 'AGCT'
+        self.genome_alphabet = genome_alphabet
+
+        self.birth_rate = birth_rate
+        self.death_rate = death_rate
+        self.kernel = MutationKernel(mutation_rate,
+                                     len(self.genome),
+                                     genome_alphabet,
+                                     position_rates,
+                                     base_weights)
+        self.epsilon = epsilon
+        if critical_size is None:
+            critical_size = int(np.ceil(10 / epsilon))
+        self.critical_size = critical_size
+        self.time = 0.0
+        self.rng = RandomStream() if rng is None else rng
+    # ---
+
+    @property
+    def total_cells(self):
+        return int(self.genotypes.counts.sum())
+    # ---
+
+    def clone_sizes(self):
+        """Map each genotype with alive cells to the number of them."""
+        return self.genotypes.clone_sizes()
+    # ---
+
+    def seed(self, n=1, genotype=0, log=None):
+        """Add `n` cells of the genotype (default the ancestral one)."""
+        if log and not self.genotypes.counts[genotype]:
+            self.genotypes.add_cells(genotype, n)
+            log.log('newclone', self, genotype)
+        else:
+            self.genotypes.add_cells(genotype, n)
+    # ---
+
+    def leap_size(self, counts):
+        """The length of the next leap for the given clone sizes.
+
+        Smaller clones bound it as if they had ``critical_size``
+        cells, so that their exact steps stay within a short leap.
+
+        """
+        b, d = self.birth_rate, self.death_rate
+        counts = np.maximum(counts, self.critical_size).astype(float)
+        drift = abs(b - d) * counts
+        spread = (b + d) * counts
+        bound = self.epsilon * counts
+        with np.errstate(divide='ignore'):
+            taus = np.minimum(bound / drift, bound**2 / spread)
+        return taus.min(initial=np.inf)
+    # ---
+
+    def exposure(self, tau):
+        """Expected time lived by the descendants of a cell in a clone
+        during `tau` units of time.
+
+        A clone grows at rate ``r = b*(1 - 2*p) - d`` (`p` the chance of
+        a daughter to mutate and leave), so a cell and it's descendants
+        live ``(exp(r*tau) - 1) / r`` units of time. Drawing the events 
+        of a leap against it, instead of against `tau`, makes the 
+        expected growth of the clones exact.
+
+        """
+        p_mutant = -np.expm1(-self.kernel.rate)
+        r = self.birth_rate * (1 - 2*p_mutant) - self.death_rate
+        if not r:
+            return tau
+        return np.expm1(r * tau) / r
+    # ---
+
+    def _exact(self, clones, sizes, tau):
+        """Simulate the clones event by event for `tau` units of time.
+
+        `tau` may be given per clone. The next event of every clone is
+        drawn at once, until all of them run past their time or go
+        extinct. Return the final sizes, the clone of each mutant
+        daughter and the time left to it.
+
+        """
+        b, d = self.birth_rate, self.death_rate
+        p_mutant = -np.expm1(-self.kernel.rate)
+        rng = self.rng
+        sizes = sizes.copy()
+        if not b + d:
+            return sizes, clones[:0], np.empty(0)
+
+        # Time left to each clone
+        left = np.broadcast_to(np.asarray(tau, dtype=float), 
+                               sizes.shape).copy()
+        active = np.arange(len(sizes))
+        mutants, spans = [clones[:0]], [np.empty(0)]
+        while len(active):
+            waits = rng.exponential(size=len(active)) / ((b + d) * sizes[active])
+            happens = waits < left[active]
+            active = active[happens]
+            left[active] -= waits[happens]
+
+            # A division, or else a death
+            divides = rng.random(len(active)) * (b + d) < b
+            mutated = np.where(divides, rng.binomial(2, p_mutant, len(active)), 0)
+            sizes[active] += np.where(divides, 1, -1) - mutated
+            mutants.append(np.repeat(clones[active], mutated))
+            spans.append(np.repeat(left[active], mutated))
+            active = active[sizes[active] > 0]
+        return sizes, np.concatenate(mutants), np.concatenate(spans)
+    # ---
+
+    def _birth_spans(self, n, tau):
+        """Time left in a leap of `tau` to `n` daughters of a big clone.
+
+        Births happen at a rate proportional to the size of the clone,
+        so their times are drawn with density ``exp(r*s)`` in the leap.
+
+        """
+        p_mutant = -np.expm1(-self.kernel.rate)
+        r = self.birth_rate * (1 - 2*p_mutant) - self.death_rate
+        u = self.rng.random(n)
+        if not r:
+            return tau * (1 - u)
+        return tau - np.log1p(u * np.expm1(r * tau)) / r
+    # ---
+
+    def leap(self, tau, log=None):
+        """Advance the clones by `tau` units of time."""
+        table = self.genotypes
+        counts = table.counts
+        alive = np.flatnonzero(counts)
+        sizes = counts[alive]
+        before = counts.copy() if log else None
+        rng = self.rng
+
+        # Big clones, births and deaths as independent Poisson variates
+        big = sizes >= self.critical_size
+        clones, n = alive[big], sizes[big]
+        exposure = n * self.exposure(tau)
+        births = rng.poisson(self.birth_rate * exposure)
+        deaths = rng.poisson(self.death_rate * exposure)
+        # The daughters that mutate leave the clone
+        mutants = rng.binomial(2 * births, -np.expm1(-self.kernel.rate))
+        new_sizes = np.empty_like(sizes)
+        new_sizes[big] = np.maximum(n + births - deaths - mutants, 0)
+
+        # Small clones, exactly
+        new_sizes[~big], small_mutants, small_spans = self._exact(
+            alive[~big], sizes[~big], tau)
+        table.change_counts(alive, new_sizes - sizes)
+
+        # Found the clones of the mutant daughters, which then grow
+        # exactly for the rest of the leap
+        parents = np.concatenate([np.repeat(clones, mutants), small_mutants])
+        spans = np.concatenate([self._birth_spans(mutants.sum(), tau), 
+                                small_spans])
+        touched = [alive[:0]]
+        while len(parents):
+            founded = self.kernel.mutate(parents, table, nonzero=True, 
+                                         rng=self.rng)
+            grown, parents, spans = self._exact(
+                np.arange(len(founded)), np.ones_like(founded), spans)
+            parents = founded[parents]
+            founded, inverse = np.unique(founded, return_inverse=True)
+            grown = np.bincount(inverse, weights=grown).astype(sizes.dtype)
+            table.change_counts(founded, grown)
+            touched.append(founded)
+
+        if log:
+            # Clones that appeared or went extinct
+            touched = np.unique(np.concatenate(touched))
+            known = touched[touched < len(before)]
+            founded = np.concatenate([known[before[known] == 0],
+                                      touched[touched >= len(before)]])
+            for genotype in founded.tolist():
+                log.log('newclone', self, genotype)
+            gone = np.concatenate([alive, founded])
+            extinct = gone[table.counts[gone] == 0]
+            for genotype in extinct.tolist():
+                log.log('extinction', self, genotype)
+
+        self.time += tau
+    # ---
+
+    def run_for(self, duration, log=None):
+        """Advance the clones by `duration` units of time."""
+        end = self.time + duration
+        while self.time < end:
+            counts = self.genotypes.counts
+            alive = counts[counts > 0]
+            if not len(alive):
+                break
+            tau = min(self.leap_size(alive), end - self.time)
+            self.leap(tau, log=log)
+        self.time = end
+    # ---
+
+    def process(self, *args, log=None, **kwargs):
+        'Move a step (a unit of time) forward in time.'
+        self.run_for(1, log=log)
+    # ---
+# --- ClonePopulation
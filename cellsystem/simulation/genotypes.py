@@ -0,0 +1,495 @@
+"""
+
+Interned genotypes of a cell lineage.
+
+Cells that descend from a common ancestor without mutating in between
+carry the same genotype. Instead of keeping a genome per cell, the
+lineage keeps a table of the distinct genotypes and each cell stores
+only the id of it's genotype.
+
+"""
+
+import numpy as np
+
+from .mutations import EMPTY_HISTORY
+
+
+class GenotypeTable:
+    """The distinct genotypes of a lineage and their clone sizes.
+
+    Each genotype is identified by an integer id and is defined by
+    it's parent genotype and the mutation that separates them. The
+    genotype 0 is the ancestral one. Genotypes are interned by genome:
+    a mutation that leads to a genome already in the table (a back 
+    mutation, or the same mutations in another order) gives back the
+    id of that genome, so there is one record per distinct genome. The
+    parent and the history of a genotype are those of the first path 
+    that reached it's genome.
+
+    For each genotype the table keeps:
+        + It's parent genotype (-1 for the ancestral genotype).
+        + It's mutation history (see ``MutationHistory``).
+        + The number of alive cells that carry it (it's clone size).
+        + It's genome, assembled when the genotype is derived (in the
+          infinite-sites model, only when first needed).
+        + Optionally, it's heritable traits (see ``TraitTable``).
+
+    Example::
+
+        >>> table = GenotypeTable('AAAA')
+        >>> g = table.derive(0, (1, 'T'))
+        >>> table.genome(g)
+        'ATAA'
+        >>> table.derive(0, (1, 'T')) == g
+        True
+        >>> table.derive(g, (1, 'A'))  # Back to the ancestral genome
+        0
+
+    In the infinite-sites model, every mutation hits a new site, so it
+    is identified only by a unique integer id, and a genotype is the
+    set of ids it carries. The set is not stored: it is the chain of
+    mutations from the ancestral genotype, so each genotype costs only
+    it's parent and it's own mutation::
+
+        >>> table = GenotypeTable('AAAA', infinite_sites=True)
+        >>> g1 = table.derive_novel(0)
+        >>> g2 = table.derive_novel(g1)
+        >>> table.genome(g2)
+        (0, 1)
+        >>> table.shared_mutations(g1, g2)
+        [0]
+
+    """
+
+    def __init__(self, genome, capacity=64, infinite_sites=False, traits=None):
+        """
+        Params:
+
+            genome (str): The ancestral genome.
+            capacity (int): Number of genotypes initially reserved.
+            infinite_sites (bool): Use the infinite-sites mutation model.
+            traits (optional TraitTable): Heritable traits of the genotypes.
+
+        """
+        self.ancestral_genome = genome
+        self.traits = traits
+        self.infinite_sites = infinite_sites
+        self.site_count = 0  # Mutations ids handed out (infinite sites)
+        self.parents = [-1]
+        self.histories = [EMPTY_HISTORY]
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._genomes = [genome]
+        self._children = {}  # (parent, mutation) -> genotype
+        self._interned = {genome: 0}  # Genome -> genotype
+        self._coded_children = {}  # Alphabet -> sorted codes and children
+        self._tree_index = (np.array([-1]), np.array([-1]), np.array([0]))
+        if infinite_sites:
+            self._genomes[0] = ()
+            self._interned = None
+    # ---
+
+    def __len__(self):
+        return len(self.parents)
+    # ---
+
+    @property
+    def counts(self):
+        """Number of alive cells of each genotype (read-only view)."""
+        counts = self._counts[:len(self)]
+        counts.flags.writeable = False
+        return counts
+    # ---
+
+    def _register(self, parent, mutation):
+        """Add a new genotype to the table and return it's id."""
+        genotype = len(self.parents)
+        self.parents.append(parent)
+        self.histories.append(self.histories[parent].push(mutation))
+        self._genomes.append(None)
+        if genotype >= len(self._counts):
+            counts = np.zeros(2*len(self._counts), dtype=np.int64)
+            counts[:len(self._counts)] = self._counts
+            self._counts = counts
+        if self.traits is not None:
+            self.traits.register(genotype, parent)
+        return genotype
+    # ---
+
+    def derive(self, genotype, mutation):
+        """The id of the genotype resulting from mutating `genotype`.
+        
+        A new genotype is registered only if the resulting genome is not
+        in the table yet.
+        
+        """
+        key = (genotype, mutation)
+        derived = self._children.get(key)
+        if derived is None:
+            if self.infinite_sites:
+                raise ValueError('In the infinite-sites model mutations '
+                                 'are only created by `derive_novel`.')
+            genome = self._genomes[genotype]
+            position, mutated = mutation
+            genome = genome[:position] + mutated + genome[position+1:]
+            
+            derived = self._interned.get(genome)
+            if derived is None:
+                derived = self._register(genotype, mutation)
+                self._genomes[derived] = genome
+                self._interned[genome] = derived
+            self._children[key] = derived
+        return derived
+    # ---
+
+    def derive_many(self, genotypes, positions, bases, alphabet):
+        """The ids of the genotypes resulting from mutating each of the given.
+
+        The i-th genotype gets the base ``alphabet[bases[i]]`` at the
+        position ``positions[i]``. The mutations already derived are 
+        looked up all at once, as integer codes in a sorted array, and
+        only the new genotypes are registered one by one (in order of 
+        appearance).
+
+        """
+        genotypes = np.asarray(genotypes, dtype=np.int64)
+        alphabet = tuple(alphabet)
+        codes = self._mutation_codes(genotypes, positions, bases, alphabet)
+        known_codes, known = self._known_children(alphabet)
+
+        derived = np.empty(len(codes), dtype=np.int64)
+        at = np.searchsorted(known_codes, codes)
+        found = at < len(known_codes)
+        found[found] = known_codes[at[found]] == codes[found]
+        derived[found] = known[at[found]]
+
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            _, first, inverse = np.unique(codes[missing], return_index=True,
+                                          return_inverse=True)
+            created = np.empty(len(first), dtype=np.int64)
+            for k in np.argsort(first, kind='stable').tolist():
+                i = int(missing[first[k]])
+                mutation = (int(positions[i]), alphabet[bases[i]])
+                created[k] = self.derive(int(genotypes[i]), mutation)
+            derived[missing] = created[inverse.ravel()]
+        return derived
+    # ---
+
+    def _mutation_codes(self, genotypes, positions, bases, alphabet):
+        """Integer codes of (parent, position, base) mutations."""
+        length = len(self.ancestral_genome)
+        return ((np.asarray(genotypes, dtype=np.int64) * length 
+                 + np.asarray(positions, dtype=np.int64)) * len(alphabet)
+                + np.asarray(bases, dtype=np.int64))
+    # ---
+
+    def _known_children(self, alphabet):
+        """The sorted codes of the derived mutations, and their genotypes.
+
+        The arrays are rebuilt from the derived mutations when these
+        have doubled, so between rebuilds the newest ones are missing 
+        (and found by ``derive``).
+
+        """
+        index = self._coded_children.get(alphabet)
+        if index is not None and len(self._children) < 2 * index[2]:
+            return index[:2]
+
+        codes = {base: code for code, base in enumerate(alphabet)}
+        parents, positions, bases, children = [], [], [], []
+        for (parent, (position, base)), child in self._children.items():
+            if base in codes:
+                parents.append(parent)
+                positions.append(position)
+                bases.append(codes[base])
+                children.append(child)
+        keys = self._mutation_codes(parents, positions, bases, alphabet)
+        order = np.argsort(keys)
+        index = (keys[order], 
+                 np.array(children, dtype=np.int64)[order],
+                 max(len(self._children), 1024))
+        self._coded_children[alphabet] = index
+        return index[:2]
+    # ---
+
+    def derive_novel(self, genotype):
+        """The id of a new genotype, with a mutation at a new site.
+
+        Only valid in the infinite-sites model.
+
+        """
+        if not self.infinite_sites:
+            raise ValueError('Novel mutations require the infinite-sites model.')
+        mutation = self.site_count
+        self.site_count += 1
+        return self._register(genotype, mutation)
+    # ---
+
+    def derive_novel_many(self, genotypes):
+        """The ids of new genotypes, one for each of the given parents.
+
+        Each new genotype gets a mutation at a new site, in the order of
+        the parents. Only valid in the infinite-sites model.
+
+        """
+        if not self.infinite_sites:
+            raise ValueError('Novel mutations require the infinite-sites model.')
+        parents = [int(g) for g in genotypes]
+        first, n = len(self.parents), len(parents)
+        mutations = range(self.site_count, self.site_count + n)
+        self.site_count += n
+
+        histories = self.histories
+        pushed = [histories[g].push(m) for g, m in zip(parents, mutations)]
+        self.parents.extend(parents)
+        histories.extend(pushed)
+        self._genomes.extend([None] * n)
+        if first + n > len(self._counts):
+            counts = np.zeros(max(2*len(self._counts), first + n), 
+                              dtype=np.int64)
+            counts[:len(self._counts)] = self._counts
+            self._counts = counts
+        if self.traits is not None:
+            for genotype, parent in enumerate(parents, first):
+                self.traits.register(genotype, parent)
+        return np.arange(first, first + n)
+    # ---
+
+    def intern(self, mutations, base=0):
+        """The id of the genotype that extends `base` with the mutations."""
+        genotype = base
+        for mutation in mutations:
+            genotype = self.derive(genotype, mutation)
+        return genotype
+    # ---
+
+    def history(self, genotype):
+        """The mutation history of the genotype."""
+        return self.histories[genotype]
+    # ---
+
+    def mutations(self, genotype):
+        """The mutations of the genotype, from the oldest to the newest."""
+        return self.histories[genotype].mutations()
+    # ---
+
+    def mutation(self, genotype):
+        """The mutation that separates the genotype from it's parent."""
+        return self.histories[genotype].mutation
+    # ---
+
+    def genome(self, genotype):
+        """The genome of the genotype.
+
+        In the infinite-sites model no sequence is assembled, the genome
+        is the (sorted) tuple of the mutation ids of the genotype, built
+        the first time it is requested.
+
+        """
+        genome = self._genomes[genotype]
+        if genome is None:
+            genome = self._genomes[genotype] = tuple(self.mutations(genotype))
+        return genome
+    # ---
+
+    def add_cells(self, genotype, n=1):
+        """Account for `n` new cells of the genotype."""
+        self._counts[genotype] += n
+    # ---
+
+    def remove_cells(self, genotype, n=1):
+        """Account for `n` cells of the genotype that are gone."""
+        self._counts[genotype] -= n
+    # ---
+
+    def move_cell(self, source, destination):
+        """Account for a cell that changed it's genotype."""
+        self._counts[source] -= 1
+        self._counts[destination] += 1
+    # ---
+
+    def add_many(self, genotypes):
+        """Account for new cells, one for each genotype given."""
+        np.add.at(self._counts, genotypes, 1)
+    # ---
+
+    def remove_many(self, genotypes):
+        """Account for gone cells, one for each genotype given."""
+        np.subtract.at(self._counts, genotypes, 1)
+    # ---
+
+    def change_counts(self, genotypes, deltas):
+        """Add the net changes to the counts of distinct genotypes."""
+        self._counts[genotypes] += deltas
+    # ---
+
+    def genome_matrix(self, genotypes, alphabet):
+        """The genomes of the genotypes as a matrix of alphabet codes.
+
+        Return a (len(genotypes) x genome length) `uint8` matrix whose
+        entries are the positions of each base in `alphabet`. It is
+        assembled in bulk: the ancestral genome is broadcast to every
+        distinct genotype and their mutations are scattered on top.
+
+        Raises:
+
+            ValueError:
+                In the infinite-sites model, or if a base is not in
+                the alphabet.
+
+        """
+        if self.infinite_sites:
+            raise ValueError('Genome sequences are not defined in the '
+                             'infinite-sites model, see `mutation_matrix`.')
+        codes = {base: code for code, base in enumerate(alphabet)}
+        try:
+            ancestral = np.array([codes[base] 
+                                  for base in self.ancestral_genome],
+                                 dtype=np.uint8)
+        except KeyError as error:
+            raise ValueError('Base {} is not in the alphabet.'.format(error))
+
+        genotypes = np.asarray(genotypes, dtype=np.int64)
+        distinct, inverse = np.unique(genotypes, return_inverse=True)
+        length = len(ancestral)
+        rows = np.broadcast_to(ancestral, (len(distinct), length)).copy()
+
+        # Gather every mutation of every distinct genotype
+        cells, positions, bases = [], [], []
+        for row, genotype in enumerate(distinct.tolist()):
+            for position, mutated in self.histories[genotype]:
+                cells.append(row)
+                positions.append(position)
+                bases.append(mutated)
+
+        if cells:
+            try:
+                bases = np.array([codes[base] for base in bases], 
+                                 dtype=np.uint8)
+            except KeyError as error:
+                raise ValueError('Base {} is not in the alphabet.'.format(error))
+            flat = np.array(cells) * length + np.array(positions)
+            # The newest mutation at each position wins
+            flat, bases = flat[::-1], bases[::-1]
+            flat, first = np.unique(flat, return_index=True)
+            rows.flat[flat] = bases[first]
+
+        return rows[inverse.ravel()]
+    # ---
+
+    def mutation_ids(self, genotype):
+        """The ids of the mutations of the genotype, a sorted array.
+
+        Only valid in the infinite-sites model (the ids grow along a
+        lineage, so the oldest mutation has the lowest id).
+
+        """
+        return np.array(self.mutations(genotype), dtype=np.int64)
+    # ---
+
+    def _tree(self):
+        """The parent, the mutation id and the depth of each genotype.
+
+        Only valid in the infinite-sites model. The ancestral genotype 
+        has no mutation (-1). The arrays are kept between calls, only 
+        the genotypes registered since the last call are added.
+
+        """
+        parents, sites, depths = self._tree_index
+        known, n = len(parents), len(self)
+        if known < n:
+            histories = self.histories[known:n]
+            parents = np.append(parents, self.parents[known:n])
+            sites = np.append(sites, [-1 if h.mutation is None else h.mutation
+                                      for h in histories])
+            depths = np.append(depths, [h.length for h in histories])
+            self._tree_index = parents, sites, depths
+        return parents, sites, depths
+    # ---
+
+    def shared_mutations(self, genotype, other):
+        """The ids of the mutations two genotypes have in common.
+
+        Only valid in the infinite-sites model. The ids grow along a 
+        lineage, so the shared mutations are the common start of the 
+        mutations of both (those of their latest common ancestor).
+
+        """
+        ids, others = self.mutation_ids(genotype), self.mutation_ids(other)
+        n = min(len(ids), len(others))
+        diverged = np.flatnonzero(ids[:n] != others[:n])
+        shared = diverged[0] if len(diverged) else n
+        return ids[:shared].tolist()
+    # ---
+
+    def mutation_matrix(self, genotypes=None):
+        """A boolean (genotypes x mutations) matrix of mutation presence.
+
+        Only valid in the infinite-sites model. Default is all genotypes.
+        The rows are filled one generation of ancestors at a time.
+
+        """
+        if genotypes is None:
+            genotypes = range(len(self))
+        ancestors = np.array(list(genotypes), dtype=np.int64)
+        parents, sites, _ = self._tree()
+
+        presence = np.zeros((len(ancestors), self.site_count), dtype=bool)
+        rows = np.arange(len(ancestors))
+        while len(rows):
+            # Stop at the ancestral genotype
+            mutated = ancestors > 0
+            rows, ancestors = rows[mutated], ancestors[mutated]
+            presence[rows, sites[ancestors]] = True
+            ancestors = parents[ancestors]
+        return presence
+    # ---
+
+    def allele_frequencies(self):
+        """Fraction of the alive cells that carry each mutation.
+
+        Only valid in the infinite-sites model. The result is an array
+        indexed by mutation id.
+
+        A mutation is carried by the cells of the genotype that got it
+        and of all it's descendants. Only the ancestors of the alive 
+        genotypes are visited: their cells climb the tree one generation
+        at a time, from the deepest, adding up where their lineages meet.
+
+        """
+        counts = self.counts
+        genotypes = np.flatnonzero(counts)
+        carriers = counts[genotypes].astype(np.float64)
+        total = carriers.sum()
+        frequencies = np.zeros(self.site_count)
+        if not total:
+            return frequencies
+
+        parents, sites, depths = self._tree()
+        depth = depths[genotypes].max()
+        while depth > 0:
+            if len(genotypes) == 1:
+                # A single lineage left, add along it's mutations
+                np.add.at(frequencies, self.mutation_ids(genotypes[0]), 
+                          carriers[0])
+                break
+
+            # The deepest genotypes pass their cells to their parents
+            deepest = depths[genotypes] == depth
+            np.add.at(frequencies, sites[genotypes[deepest]], 
+                      carriers[deepest])
+            genotypes = np.where(deepest, parents[genotypes], genotypes)
+            genotypes, merged = np.unique(genotypes, return_inverse=True)
+            carriers = np.bincount(merged.ravel(), weights=carriers,
+                                   minlength=len(genotypes))
+            depth -= 1
+        return frequencies / total
+    # ---
+
+    def clone_sizes(self):
+        """Map each genotype with alive cells to the number of them."""
+        counts = self.counts
+        alive = np.flatnonzero(counts)
+        return dict(zip(alive.tolist(), counts[alive].tolist()))
+    # ---
+# --- GenotypeTable
@@ -0,0 +1,185 @@
+"""
+
+Continuous-time processing of a cell lineage.
+
+Instead of moving every cell on each discrete step, each behavior of a
+cell fires at a rate: it's weight in the lineage times it's probability
+for that cell. The engine draws the waiting time to the next event of
+the whole population and the cell that takes it (the direct method of
+Gillespie's algorithm), so no draw is spent on cells that do nothing.
+
+"""
+
+from ..utils.fenwick import FenwickTree
+
+
+class GillespieEngine:
+    """Event-driven, continuous-time dynamics of a cell lineage.
+
+    The total rate of each alive cell (the sum of the rates of it's
+    behaviors) is kept in a ``FenwickTree``, so picking the cell of the
+    next event and updating a rate take O(log n).
+
+    A rate is evaluated when the cell is born and again after each event
+    the cell takes. When an event fires, the behavior is chosen with the
+    probabilities at that moment, and the event is rejected if they add
+    up to less than the stored rate. The dynamics are exact as long as
+    the probabilities of a cell do not grow between it's own events.
+
+    Behaviors are performed through the same log interface as in the
+    discrete steps (see ``logged``). A time unit corresponds to one
+    discrete step: a cell takes on average one event per unit of time
+    if all of it's probabilities are 1.
+
+    """
+
+    def __init__(self, lineage, capacity=1024):
+        """
+        Params:
+
+            lineage (CellLine): The lineage whose cells are processed.
+            capacity (int): Number of cells initially reserved.
+
+        """
+        self.lineage = lineage
+        self.time = 0.0
+        self.rates = FenwickTree(capacity)
+        self.cells = [None] * capacity  # The cell at each position
+        self.positions = {}  # Cell -> position in the tree
+        self.free = list(range(capacity - 1, -1, -1))
+        self.pending = []  # Newborn cells without a rate yet
+        self.updates = 0  # Rate updates since the last rebuild
+        self._table = None
+        self._weights = []
+    # ---
+
+    def __len__(self):
+        return len(self.positions)
+    # ---
+
+    @property
+    def total_rate(self):
+        """The rate of events of the whole population."""
+        return self.rates.total
+    # ---
+
+    def born(self, cell):
+        """Track a new cell, it's rate is evaluated after the current event."""
+        self.pending.append(cell)
+    # ---
+
+    def died(self, cell):
+        """Stop tracking a dead cell."""
+        position = self.positions.pop(cell, None)
+        if position is not None:
+            self.rates[position] = 0.0
+            self.cells[position] = None
+            self.free.append(position)
+    # ---
+
+    def weights(self):
+        """The normalized weights of the behaviors of the lineage."""
+        table = self.lineage.behavior_table
+        if table is not self._table:
+            self._table = table
+            self._weights = list(zip(table.actions,
+                                     table.normalized_weights.tolist()))
+        return self._weights
+    # ---
+
+    def rate(self, cell):
+        """The total rate of the behaviors of the cell."""
+        return sum(weight * action.evaluate(cell)
+                   for action, weight in self.weights())
+    # ---
+
+    def _track(self, cell):
+        """Give a position in the tree to a cell and return it."""
+        if not self.free:
+            capacity = len(self.cells)
+            self.rates.grow(2*capacity)
+            self.cells.extend([None] * capacity)
+            self.free = list(range(2*capacity - 1, capacity - 1, -1))
+        position = self.free.pop()
+        self.positions[cell] = position
+        self.cells[position] = cell
+        return position
+    # ---
+
+    def refresh(self, cell):
+        """Evaluate the rate of an alive cell."""
+        position = self.positions.get(cell)
+        if position is None:
+            position = self._track(cell)
+        self.rates[position] = self.rate(cell)
+
+        # Clear the rounding error of the updates from time to time
+        self.updates += 1
+        if self.updates > len(self.cells):
+            self.rates.rebuild()
+            self.updates = 0
+    # ---
+
+    def flush(self):
+        """Evaluate the rates of the cells born since the last flush."""
+        pending, self.pending = self.pending, []
+        for cell in pending:
+            if self.lineage.is_alive(cell):
+                self.refresh(cell)
+    # ---
+
+    def fire(self, cell, *args, log=None, **kwargs):
+        """Take an event of the cell: choose a behavior and perform it.
+
+        Return the performed action (None if the event was rejected).
+
+        """
+        u = self.lineage.rng.random() * self.rates[self.positions[cell]]
+        fired = None
+        for action, weight in self.weights():
+            u -= weight * action.evaluate(cell)
+            if u < 0:
+                fired = action
+                if log is None:
+                    action.unlogged(cell, *args, **kwargs)
+                else:
+                    action.action(cell, *args, log=log, **kwargs)
+                break
+
+        # Update the rates of the cells involved
+        self.flush()
+        if cell in self.positions:
+            self.refresh(cell)
+        return fired
+    # ---
+
+    def run_for(self, duration, *args, log=None, **kwargs):
+        """Fire the events of the next `duration` units of time.
+
+        Extra arguments are passed to the behaviors.
+
+        """
+        end = self.time + duration
+        rates, cells = self.rates, self.cells
+        rng = self.lineage.rng
+        self.flush()
+        while True:
+            total = rates.total
+            if total <= 0:
+                break
+            wait = rng.expovariate(total)
+            if self.time + wait > end:
+                break
+            self.time += wait
+
+            cell = cells[rates.find(rng.random() * total)]
+            if cell is None:
+                # Only rounding error was left in the tree
+                rates.rebuild()
+                continue
+            self.fire(cell, *args, log=log, **kwargs)
+
+        # Waiting times are memoryless, the last one can be discarded
+        self.time = end
+    # ---
+# --- GillespieEngine
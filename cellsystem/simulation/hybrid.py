@@ -0,0 +1,412 @@
+"""
+
+Hybrid agent/aggregate dynamics of a cell lineage.
+
+Growth happens at the boundary of a tumour, but most of it's cells live
+in the dense interior. The hybrid dynamics keep the boundary cells as
+individual agents, while the cells of interior sites are collapsed into
+per-site clone counts that are advanced with a few aggregate draws.
+Cells move between both representations as the front advances.
+
+"""
+
+import collections
+
+import numpy as np
+
+from .world import SparseWorld
+
+
+class HybridEngine:
+    """Advances the interior of a lineage as clone counts per site.
+
+    A site is interior when it and all of it's neighbors hold at least
+    `min_density` cells. The cells of the lineage in an interior site are
+    replaced by a count per genotype (the site is "aggregated"), and the
+    cells that arrive to an aggregated site join it's counts. When an
+    aggregated site stops being interior, it's cells become agents again.
+    Aggregated cells are counted in the occupancy of the world.
+
+    On each step, the agents are processed as usual. Then the cells of
+    every group of equal genotype in an aggregated site choose and accept
+    their behaviors in a single multinomial draw over all the groups, and
+    the behaviors taken are applied to all the groups at once by their
+    aggregate counterparts, found by name in the ``aggregate_behaviors``
+    of the lineage (a mapping of the behavior name to a function
+    ``f(sites, genotypes, counts, log=None)`` that performs it on
+    ``counts[k]`` cells of ``genotypes[k]`` in ``sites[k]``, see
+    ``add_many`` and ``remove_many``). The probabilities of the behaviors
+    are evaluated once per genotype on a probe cell with the genotype,
+    placed in one of the sites that hold it.
+
+    In dense worlds the sites to collapse and to expand are found from
+    the occupancy arrays, without walking the agents.
+
+    Aggregated cells lose their identity: logs see the cells that join an
+    aggregate die and the cells that leave it (or that are born from it
+    outside of the interior) appear as new cells.
+
+    """
+
+    def __init__(self, lineage, min_density=1):
+        """
+        Params:
+
+            lineage (CellLine): The lineage whose cells are processed.
+            min_density (int): Cells needed in a site to be dense.
+
+        """
+        # Deferred, the cells module depends on this one
+        from .cells import Cell
+
+        self.lineage = lineage
+        self.min_density = min_density
+        self.clones = {}  # Aggregated site -> {genotype: count}
+        self.sizes = {}  # Aggregated site -> number of cells
+        self.aggregated_cells = 0
+        self.probe = Cell(lineage)
+        self.world = None
+        # Dense worlds, aggregated cells by flat index (-1 if not aggregated)
+        self.held = None
+    # ---
+
+    def attach(self, world):
+        """Follow the sites of the world (the first time it is seen)."""
+        if self.world is not None or world is None:
+            return
+        self.world = world
+        if not isinstance(world, SparseWorld):
+            self.held = np.full(world.sites.size, -1, dtype=np.int64)
+    # ---
+
+    def occupancy(self, site):
+        """Number of cells in the site, agents and aggregated."""
+        return site.world.occupancy_of(site)
+    # ---
+
+    def is_interior(self, site):
+        """Whether the site and all it's neighbors are dense."""
+        min_density = self.min_density
+        if self.occupancy(site) < min_density:
+            return False
+
+        world = site.world
+        if site.flat_index is not None:
+            # Dense world, gather the neighbors from the table
+            neighbors = world.neighbor_table[site.flat_index]
+            neighbors = neighbors[neighbors >= 0]
+            counts = world.occupancy.reshape(-1)[neighbors]
+            return not len(counts) or counts.min() >= min_density
+
+        coordinates = site.coordinates
+        for offset in world.neighborhood:
+            neighbor = world.at(tuple(x + dx for x, dx in zip(coordinates,
+                                                               offset)))
+            if self.occupancy(neighbor) < min_density:
+                return False
+        return True
+    # ---
+
+    def interior(self):
+        """Whether each site of a dense world is interior, by flat index."""
+        world = self.world
+        dense = world.occupancy.reshape(-1) >= self.min_density
+        table = world.neighbor_table
+        neighbors = np.where(table >= 0, dense[table], True)
+        return dense & neighbors.all(axis=1)
+    # ---
+
+    def _hold(self, site, n):
+        """Count `n` more aggregated cells in the site."""
+        self.sizes[site] += n
+        self.aggregated_cells += n
+        if self.held is not None:
+            self.held[site.flat_index] += n
+    # ---
+
+    def _account(self, sites, genotypes, counts):
+        """Update the totals and the world counts for the aggregated cells.
+
+        ``counts[k]`` cells (may be negative) of ``genotypes[k]`` are
+        counted in ``sites[k]``, all at once. The counts per site and
+        genotype must be already updated.
+
+        """
+        lineage = self.lineage
+        counts = np.asarray(counts)
+        self.aggregated_cells += int(counts.sum())
+        if self.held is not None:
+            np.add.at(self.held, [site.flat_index for site in sites], counts)
+        distinct, inverse = np.unique(genotypes, return_inverse=True)
+        totals = np.bincount(inverse.reshape(-1), weights=counts)
+        lineage.genotypes.change_counts(distinct, totals.astype(np.int64))
+        coordinates = [site.coordinates for site in sites]
+        self.world.update_occupancy_many(coordinates, lineage, counts)
+    # ---
+
+    def add(self, site, genotype, n=1, log=None):
+        """Add `n` cells of the genotype to the site.
+
+        They join the counts if the site is aggregated, else they are
+        added as new agents.
+
+        """
+        counts = self.clones.get(site)
+        if counts is not None:
+            counts[genotype] = counts.get(genotype, 0) + n
+            self._hold(site, n)
+            self.lineage.genotypes.add_cells(genotype, n)
+            site.world.update_occupancy(site, self.lineage, n)
+            return
+
+        for _ in range(n):
+            cell = self.lineage.new_cell()
+            cell.genotype = genotype
+            cell.add_to(site)
+            if log:
+                log.log('newcell', cell)
+    # ---
+
+    def add_many(self, sites, genotypes, log=None):
+        """Add a cell of each genotype to the respective site.
+
+        The cells that arrive to aggregated sites are counted at once,
+        the others are added as new agents (see ``add``).
+
+        """
+        genotypes = np.asarray(genotypes).tolist()
+        arrivals = collections.Counter(zip(list(sites), genotypes))
+        joined = []
+        for (site, genotype), n in arrivals.items():
+            counts = self.clones.get(site)
+            if counts is None:
+                self.add(site, genotype, n, log=log)
+                continue
+            counts[genotype] = counts.get(genotype, 0) + n
+            self.sizes[site] += n
+            joined.append((site, genotype, n))
+
+        if joined:
+            self._account(*zip(*joined))
+    # ---
+
+    def remove(self, site, genotype, n=1):
+        """Remove `n` cells of the genotype from an aggregated site."""
+        counts = self.clones[site]
+        counts[genotype] -= n
+        if not counts[genotype]:
+            del counts[genotype]
+        self._hold(site, -n)
+        self.lineage.genotypes.remove_cells(genotype, n)
+        site.world.update_occupancy(site, self.lineage, -n)
+    # ---
+
+    def remove_many(self, sites, genotypes, counts):
+        """Remove ``counts[k]`` cells of ``genotypes[k]`` from ``sites[k]``.
+
+        The sites must be aggregated. The counts are updated at once.
+
+        """
+        sites, genotypes = list(sites), np.asarray(genotypes).tolist()
+        counts = np.asarray(counts)
+        for site, genotype, n in zip(sites, genotypes, counts.tolist()):
+            clone = self.clones[site]
+            clone[genotype] -= n
+            if not clone[genotype]:
+                del clone[genotype]
+            self.sizes[site] -= n
+        self._account(sites, genotypes, -counts)
+    # ---
+
+    def _aggregate(self, site):
+        """Mark the site as aggregated."""
+        if site in self.clones:
+            return
+        self.attach(site.world)
+        self.clones[site] = {}
+        self.sizes[site] = 0
+        if self.held is not None:
+            self.held[site.flat_index] = 0
+    # ---
+
+    def collapse(self, site, agents=None, log=None):
+        """Aggregate the agents of the lineage in the site.
+
+        The `agents` in the site may be given if they are already known
+        (see ``CellLine.cells_at``).
+
+        """
+        lineage = self.lineage
+        self._aggregate(site)
+
+        if agents is None:
+            agents = lineage.cells_at(site)
+        for cell in agents:
+            if log:
+                log.preparefor('death', cell)
+            genotype = cell.genotype
+            site.remove_guest(cell)
+            lineage.handle_death(cell)
+            if log:
+                log.log('death', cell)
+            self.add(site, genotype)
+    # ---
+
+    def _collapse_many(self, flat_indices, log=None):
+        """Aggregate the agents in the sites of a dense world.
+
+        The agents of an array-backed lineage are found in a single pass
+        over the columns, and collapsed in bulk when there is no log.
+
+        """
+        # Deferred, the cells module depends on this one
+        from .cells import CellView
+
+        world = self.world
+        sites = world.sites[flat_indices]
+        columns = self.lineage.columns
+        if columns is None:
+            for site in sites.tolist():
+                self.collapse(site, log=log)
+            return
+
+        slots = columns.alive_slots
+        slots = slots[columns.placed[slots]]
+        where = np.ravel_multi_index(tuple(columns.coordinates[slots].T),
+                                     world.shape)
+        chosen = np.isin(where, flat_indices)
+        slots, where = slots[chosen], where[chosen]
+
+        if log:
+            # Cell by cell, site by site and in order of their indices
+            order = np.lexsort((columns.index[slots], where))
+            grouped = {}
+            for slot, flat in zip(slots[order].tolist(), where[order].tolist()):
+                grouped.setdefault(flat, []).append(slot)
+            for site in sites.tolist():
+                agents = [CellView(self.lineage, slot)
+                          for slot in grouped.get(site.flat_index, [])]
+                self.collapse(site, agents, log=log)
+            return
+
+        for site in sites.tolist():
+            self._aggregate(site)
+        genotypes = columns.genotype[slots]
+        columns.unplace_many(slots)
+        columns.release_many(slots)
+        self.add_many(world.sites[where], genotypes)
+    # ---
+
+    def expand(self, site, log=None):
+        """Turn the aggregated cells in the site into agents."""
+        counts = self.clones.pop(site)
+        size = self.sizes.pop(site)
+        self.aggregated_cells -= size
+        if self.held is not None:
+            self.held[site.flat_index] = -1
+        site.world.update_occupancy(site, self.lineage, -size)
+        for genotype, n in counts.items():
+            self.lineage.genotypes.remove_cells(genotype, n)
+            self.add(site, genotype, n, log=log)
+    # ---
+
+    def process_aggregates(self, log=None):
+        """Move the aggregated cells a step forward in time."""
+        lineage = self.lineage
+        table = lineage.behavior_table
+        try:
+            effects = [lineage.aggregate_behaviors[action.name]
+                       for action in table.actions]
+        except KeyError as error:
+            raise ValueError('Behavior {} has no aggregate counterpart.'
+                             .format(error))
+
+        # A snapshot, so that the cells that arrive do not act again
+        groups = [(site, genotype, n)
+                  for site, counts in self.clones.items()
+                  for genotype, n in counts.items()]
+        if not groups:
+            return
+        sites = np.empty(len(groups), dtype=object)
+        sites[:] = [site for site, _, _ in groups]
+        genotypes = np.array([genotype for _, genotype, _ in groups])
+        counts = np.array([n for _, _, n in groups])
+
+        # The probabilities of each genotype, on the probe placed in the
+        # first site that holds it
+        distinct, first, inverse = np.unique(genotypes, return_index=True,
+                                             return_inverse=True)
+        weights = np.append(table.normalized_weights, 0)
+        probabilities = np.tile(weights, (len(distinct), 1))
+        probe = self.probe
+        for row in np.argsort(first).tolist():
+            probe.site = sites[first[row]]
+            probe._genotype = int(distinct[row])
+            for k, action in enumerate(table.actions):
+                probabilities[row, k] *= min(max(action.evaluate(probe), 0), 1)
+
+        # Choice and acceptance of all the cells at once
+        probabilities = probabilities[inverse.reshape(-1)]
+        taken = lineage.rng.multinomial(counts, probabilities)
+        for k, effect in enumerate(effects):
+            chosen = taken[:, k] > 0
+            if chosen.any():
+                effect(sites[chosen], genotypes[chosen], taken[chosen, k],
+                       log=log)
+    # ---
+
+    def rebalance(self, log=None):
+        """Move the cells between representations as the front advances."""
+        lineage = self.lineage
+        if self.world is None:
+            if lineage.columns is not None:
+                self.attach(lineage.columns.world)
+            else:
+                self.attach(next((cell.site.world
+                                  for cell in lineage.alive_cells), None))
+        if self.held is None:
+            return self._rebalance_sites(log=log)
+
+        world = self.world
+        interior = self.interior()
+        aggregated = self.held >= 0
+        occupancy = world.lineage_occupancy(lineage).reshape(-1)
+        agents = occupancy - np.maximum(self.held, 0)
+
+        # Interior agents and agents that arrived to the interior, then
+        # the aggregated sites that reached the front
+        expanding = np.flatnonzero(aggregated & ~interior)
+        self._collapse_many(np.flatnonzero((agents > 0)
+                                           & (interior | aggregated)),
+                            log=log)
+        for site in world.sites[expanding].tolist():
+            self.expand(site, log=log)
+    # ---
+
+    def _rebalance_sites(self, log=None):
+        """Rebalance site by site, for sparse worlds.
+
+        The sites are visited in order of their coordinates, as in dense
+        worlds.
+
+        """
+        collapsing = [(site, agents)
+                      for site, agents in self.lineage.cells_by_site().items()
+                      if site in self.clones or self.is_interior(site)]
+        expanding = [site for site in self.clones
+                     if not self.is_interior(site)]
+
+        for site, agents in sorted(collapsing,
+                                   key=lambda pair: pair[0].coordinates):
+            self.collapse(site, agents, log=log)
+        for site in sorted(expanding, key=lambda site: site.coordinates):
+            self.expand(site, log=log)
+    # ---
+
+    def process(self, *args, log=None, **kwargs):
+        """Move a step forward in time."""
+        self.lineage.process_agents(*args, log=log, **kwargs)
+        self.process_aggregates(log=log)
+        self.rebalance(log=log)
+    # ---
+# --- HybridEngine
@@ -0,0 +1,49 @@
+"""
+
+Kernels of the synchronous steps of array-backed lineages.
+
+The array kernels of a step choose the action of each cell, count the
+cells in each site and grant the free places of the sites, each one in
+a few vectorized NumPy calls over the whole population.
+
+"""
+
+import numpy as np
+
+
+def choose_actions(cumulative, draws):
+    """The action chosen with each uniform draw.
+
+    The draws are inverted through the cumulative weights of the actions.
+
+    """
+    choices = np.searchsorted(cumulative, draws, side='right')
+    return np.minimum(choices, len(cumulative) - 1)
+# ---
+
+def site_occupancy(sites, size):
+    """Number of cells in each of `size` sites, given the site of each cell."""
+    return np.bincount(sites, minlength=size)
+# ---
+
+def grant_places(targets, requesters, free):
+    """Grant the free places of the sites to the requests for them.
+
+    Params:
+
+        targets (array): The site requested by each request.
+        requesters (array): The index of the cell of each request.
+        free (array): The number of free places of each site.
+
+    The places of a site are granted in order of the index of the
+    requesting cell, and of the position of the request for equal
+    indices. Return a boolean array, True for the granted requests.
+
+    """
+    order = np.lexsort((np.arange(len(targets)), requesters, targets))
+    ranked = targets[order]
+    ranks = np.arange(len(ranked)) - np.searchsorted(ranked, ranked)
+    granted = np.empty(len(targets), dtype=bool)
+    granted[order] = ranks < free[ranked]
+    return granted
+# ---
@@ -0,0 +1,209 @@
+"""
+
+Structurally shared mutation histories.
+
+A mutation history is a chain of immutable nodes, each one holding a
+single mutation and a pointer to the history it extends. Adding a
+mutation pushes a new node, so cells with a common ancestor share the
+part of the history they inherited from it instead of copying it.
+
+The ``MutationKernel`` draws new mutations for many cells at once.
+
+"""
+
+import numpy as np
+
+from ..utils.alias import AliasTable
+from ..utils.rng import default_stream
+
+
+class MutationHistory:
+    """An immutable record of the mutations of a cell.
+
+    Example::
+
+        >>> h = EMPTY_HISTORY.push((3, 'G')).push((1, 'T'))
+        >>> list(h)
+        [(3, 'G'), (1, 'T')]
+
+        # The previous history is not altered
+        >>> list(h.parent)
+        [(3, 'G')]
+
+    """
+    __slots__ = ('parent', 'mutation', 'length')
+
+    def __init__(self, parent=None, mutation=None):
+        """Create the history that extends `parent` with `mutation`.
+
+        Without a parent, the history is empty.
+
+        """
+        self.parent = parent
+        self.mutation = mutation
+        self.length = 0 if parent is None else parent.length + 1
+    # ---
+
+    @classmethod
+    def from_mutations(cls, mutations, base=None):
+        """Assemble the history that extends `base` with the mutations."""
+        history = EMPTY_HISTORY if base is None else base
+        for mutation in mutations:
+            history = history.push(mutation)
+        return history
+    # ---
+
+    def __len__(self):
+        return self.length
+    # ---
+
+    def __iter__(self):
+        """Iterate the mutations from the oldest to the newest."""
+        return iter(self.mutations())
+    # ---
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.mutations())
+    # ---
+
+    def push(self, mutation):
+        """Return the history extended with the mutation."""
+        return MutationHistory(self, mutation)
+    # ---
+
+    def mutations(self):
+        """The list of mutations, from the oldest to the newest."""
+        mutations = [None] * self.length
+        node = self
+        for i in range(self.length - 1, -1, -1):
+            mutations[i] = node.mutation
+            node = node.parent
+        return mutations
+    # ---
+# --- MutationHistory
+
+
+# The history shared by cells without mutations
+EMPTY_HISTORY = MutationHistory()
+
+
+
+class MutationKernel:
+    """Draws at once the mutations acquired by many cells.
+
+    Each cell acquires a Poisson distributed number of mutations with
+    mean `rate`. The positions hit follow the (optional) relative rate
+    profile along the genome and the new bases the (optional) relative
+    weights of the alphabet. Both are sampled from alias tables, so the
+    mutations of a whole group of cells take a few vectorized draws::
+
+        >>> kernel = MutationKernel(0.5, genome_length=10, alphabet='ACGT')
+        >>> counts, positions, bases = kernel.draw(100)
+        >>> counts.sum() == len(positions) == len(bases)
+        True
+
+    """
+
+    def __init__(self, rate, genome_length, alphabet, 
+                       position_rates=None, base_weights=None):
+        """
+        Params:
+
+            rate (float): Mean number of mutations per event.
+            genome_length (int): Number of positions in the genome.
+            alphabet (sequence): The bases a position may mutate to.
+            position_rates (optional sequence of float):
+                    Relative mutation rate of each position.
+                    Default is all positions are equally likely.
+            base_weights (optional sequence of float):
+                    Relative probability of each base of the alphabet.
+                    Default is all bases are equally likely.
+
+        """
+        if position_rates is None:
+            position_rates = np.ones(genome_length)
+        elif len(position_rates) != genome_length:
+            raise ValueError('There must be a rate for each genome position.')
+        
+        if base_weights is None:
+            base_weights = np.ones(len(alphabet))
+        elif len(base_weights) != len(alphabet):
+            raise ValueError('There must be a weight for each base.')
+
+        self.rate = rate
+        self.alphabet = tuple(alphabet)
+        self.positions = AliasTable(position_rates)
+        self.bases = AliasTable(base_weights)
+    # ---
+
+    def draw(self, n, nonzero=False, rng=None):
+        """Draw the mutations of `n` cells.
+
+        Return the number of mutations of each cell, and the flat arrays
+        of the positions and the bases (as indices of the alphabet) of
+        all of them, grouped by cell in order.
+
+        If `nonzero` is True, the cells are known to have mutated and the
+        counts follow the zero-truncated Poisson distribution.
+
+        The numbers are drawn from the given ``RandomStream``.
+
+        """
+        if rng is None:
+            rng = default_stream
+        if nonzero:
+            # Condition the first of the Poisson arrivals in [0, rate] to 
+            # happen, the rest are unconstrained
+            first = -np.log(rng.uniform(np.exp(-self.rate), 1, size=n))
+            counts = 1 + rng.poisson(self.rate - first)
+        else:
+            counts = rng.poisson(self.rate, size=n)
+        total = int(counts.sum())
+        return (counts, 
+                self.positions.sample(total, rng), 
+                self.bases.sample(total, rng))
+    # ---
+
+    def mutate(self, genotypes, table, nonzero=False, rng=None):
+        """Apply the mutations of a group of cells to their genotypes.
+
+        :param genotypes: The genotype ids of the cells.
+        :param table: The ``GenotypeTable`` the ids refer to.
+        :param nonzero: Whether every cell gets at least one mutation.
+        :param rng: The ``RandomStream`` to draw from.
+
+        Return the array of the resulting genotype ids.
+
+        """
+        genotypes = np.array(genotypes, dtype=np.int64)
+        counts, positions, bases = self.draw(len(genotypes), nonzero, rng)
+        if not len(counts) or not counts.max():
+            return genotypes
+
+        # The k-th mutations of all the cells are applied together
+        starts = np.cumsum(counts) - counts
+        for k in range(int(counts.max())):
+            cells = np.flatnonzero(counts > k)
+            if table.infinite_sites:
+                genotypes[cells] = table.derive_novel_many(genotypes[cells])
+            else:
+                hits = starts[cells] + k
+                genotypes[cells] = table.derive_many(genotypes[cells],
+                                                     positions[hits],
+                                                     bases[hits],
+                                                     self.alphabet)
+        return genotypes
+    # ---
+
+    def mutate_cells(self, cells):
+        """Apply the mutations of a group of cells of the same lineage."""
+        if not cells:
+            return
+        lineage = cells[0].lineage
+        genotypes = self.mutate([cell.genotype for cell in cells], 
+                                lineage.genotypes,
+                                rng=lineage.rng)
+        for cell, genotype in zip(cells, genotypes.tolist()):
+            cell.genotype = genotype
+    # ---
+# --- MutationKernel
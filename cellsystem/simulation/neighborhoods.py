@@ -0,0 +1,159 @@
+"""
+
+Neighborhoods of the sites of a lattice.
+
+A neighborhood is the set of offsets that lead from a site to it's
+neighbors. Each kind of neighborhood is built only once for each number
+of dimensions and radius, and it's offsets are compiled into arrays, so
+that worlds of any dimension share them at no extra cost per step.
+
+"""
+
+import itertools
+from functools import lru_cache
+
+import numpy as np
+
+
+class Neighborhood(tuple):
+    """The offsets of the neighbors of a site, as a tuple of tuples.
+
+    Besides behaving as the tuple of it's offsets, a neighborhood keeps:
+        + offsets: The offsets as a read-only (k x d) integer array.
+        + flat_offsets(shape): The offsets in the flat index of a grid of
+                               the given shape (cached by shape).
+
+    Example::
+
+        >>> hood = von_neumann(ndim=3)
+        >>> len(hood)
+        7
+        >>> hood.flat_offsets((10, 10, 10))
+        array([-100,  -10,   -1,    0,    1,   10,  100])
+
+    """
+
+    def __new__(cls, offsets, name=None):
+        """
+        Params:
+
+            offsets (iterable): The offsets, all of the same length.
+            name (optional str): The kind of the neighborhood.
+
+        """
+        self = super().__new__(cls, (tuple(int(x) for x in offset)
+                                     for offset in offsets))
+        self.name = name
+        self.offsets = np.array(self, dtype=np.int64).reshape(len(self), -1)
+        self.offsets.flags.writeable = False
+        self._flat_offsets = {}  # Shape -> flat offsets
+        return self
+    # ---
+
+    def __repr__(self):
+        return "{}({}, name={})".format(self.__class__.__name__,
+                                        tuple(self),
+                                        self.name)
+    # ---
+
+    @property
+    def ndim(self):
+        """Number of dimensions of the offsets."""
+        return self.offsets.shape[1]
+    # ---
+
+    def flat_offsets(self, shape):
+        """The offsets as steps of the flat (C-order) index of a grid.
+
+        Adding them to the flat index of a site gives the flat indices of
+        it's neighbors, as long as none of them crosses the border.
+
+        """
+        shape = tuple(shape)
+        flat = self._flat_offsets.get(shape)
+        if flat is None:
+            strides = np.cumprod((shape[1:] + (1,))[::-1])[::-1]
+            flat = self.offsets @ strides
+            flat.flags.writeable = False
+            self._flat_offsets[shape] = flat
+        return flat
+    # ---
+# --- Neighborhood
+
+
+def _box(ndim, radius):
+    """All the offsets with coordinates in [-radius, radius], in C-order."""
+    return itertools.product(range(-radius, radius + 1), repeat=ndim)
+# ---
+
+@lru_cache(maxsize=None)
+def moore(ndim=2, radius=1, center=True):
+    """The sites within `radius` steps along every axis.
+
+    With `center`, the site itself is included (so that, for instance, a
+    migrating cell may stay in place).
+
+    """
+    return Neighborhood((offset for offset in _box(ndim, radius)
+                                if center or any(offset)),
+                        'moore')
+# ---
+
+@lru_cache(maxsize=None)
+def von_neumann(ndim=2, radius=1, center=True):
+    """The sites at most `radius` steps away, counting the steps of all axes."""
+    return Neighborhood((offset for offset in _box(ndim, radius)
+                                if sum(map(abs, offset)) <= radius
+                                and (center or any(offset))),
+                        'von_neumann')
+# ---
+
+@lru_cache(maxsize=None)
+def hexagonal(ndim=2, radius=1, center=True):
+    """The six sites around a site of a hexagonal lattice.
+
+    The lattice is stored in axial coordinates: the site (i, j) touches
+    (i±1, j), (i, j±1), (i+1, j-1) and (i-1, j+1). In 3D, the lattice is
+    a stack of hexagonal layers and the sites just above and below are
+    neighbors too. Only radius 1 is supported.
+
+    """
+    if ndim not in (2, 3) or radius != 1:
+        raise ValueError('Hexagonal neighborhoods are 2D or 3D, of radius 1.')
+
+    def touching(offset):
+        i, j = offset[:2]
+        layer = offset[2] if ndim == 3 else 0
+        if layer:
+            return i == j == 0
+        return (i, j) not in ((1, 1), (-1, -1))
+
+    return Neighborhood((offset for offset in _box(ndim, 1)
+                                if touching(offset)
+                                and (center or any(offset))),
+                        'hexagonal')
+# ---
+
+
+NEIGHBORHOODS = {'moore': moore,
+                 'von_neumann': von_neumann,
+                 'hexagonal': hexagonal}
+
+def neighborhood(kind='moore', ndim=2, radius=1, center=True):
+    """The (cached) neighborhood of the given kind, see ``NEIGHBORHOODS``.
+
+    The `kind` may also be a ``Neighborhood`` or a sequence of offsets,
+    which are returned as a ``Neighborhood``.
+
+    """
+    if isinstance(kind, Neighborhood):
+        return kind
+    if isinstance(kind, str):
+        try:
+            build = NEIGHBORHOODS[kind]
+        except KeyError:
+            raise ValueError('Unknown neighborhood {}, use one of {}.'
+                             .format(kind, ', '.join(NEIGHBORHOODS)))
+        return build(ndim, radius, center)
+    return Neighborhood(kind)
+# ---
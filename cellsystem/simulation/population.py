@@ -0,0 +1,313 @@
+"""
+
+Array-backed storage for the cells of a lineage.
+
+Instead of holding a full Python object per cell, the population is
+stored as a structure of arrays: one contiguous NumPy column per
+attribute. Each cell occupies a row ("slot") of the columns, and dead
+rows are reused when new cells are born.
+
+"""
+
+import numpy as np
+
+from ..utils.indexed import IndexedIntSet
+
+
+# Coordinate value of the cells that are not placed in any site
+UNPLACED = np.iinfo(np.int64).min
+
+
+class CellColumns:
+    """Structure-of-arrays storage for the cells of a lineage.
+
+    Columns:
+        + index: The lineage label of the cell.
+        + father: The lineage label of the father (-1 if there is none).
+        + coordinates: The coordinates of the site the cell inhabits (or
+                       inhabited last, if it is not placed).
+        + placed: Whether the cell is in the site at it's coordinates.
+        + alive: Whether the slot holds an alive cell (the alive rows are
+                 also indexed in ``living``).
+        + genotype: The id of the cell's genotype in the lineage's
+                    ``GenotypeTable``.
+
+    The clone sizes of the genotype table are kept up to date as rows
+    are allocated, released or change genotype. Cells that share a
+    genotype share the id, so a division does not copy mutations.
+    
+    The columns also keep the membership of the cells in the sites: the
+    sites do not hold the cells of array-backed lineages as guests, the
+    cells in a site are found from the coordinates (see ``slots_at``),
+    and the occupancy of the world is updated as the cells are placed.
+
+    Example::
+
+        >>> columns = CellColumns(GenotypeTable('AAAA'))
+        >>> slot = columns.allocate(index=0)
+        >>> columns.alive[slot]
+        True
+
+    """
+
+    def __init__(self, genotypes, capacity=1024, ndim=2, lineage=None):
+        """
+        Params:
+
+            genotypes (GenotypeTable): The genotypes the rows refer to.
+            capacity (int): Number of rows initially reserved.
+            ndim (int): Dimensions of the space the cells inhabit.
+            lineage (CellLine): The lineage the cells are counted under
+                                in the occupancy of the world.
+
+        """
+        self.size = 0  # Rows used so far (alive or dead)
+        self.index = np.empty(capacity, dtype=np.int64)
+        self.father = np.empty(capacity, dtype=np.int64)
+        self.coordinates = np.empty((capacity, ndim), dtype=np.int64)
+        self.placed = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.genotype = np.empty(capacity, dtype=np.int64)
+
+        self.living = IndexedIntSet(capacity)
+        self.free = []  # Dead rows available for reuse
+        self.genotypes = genotypes
+        self.lineage = lineage
+        self.world = None  # The world the coordinates refer to
+        self._sites = None  # Site coordinates -> slots, see slots_at
+    # ---
+
+    @property
+    def capacity(self):
+        """Number of rows reserved."""
+        return len(self.index)
+    # ---
+
+    @property
+    def alive_count(self):
+        """Number of alive cells."""
+        return len(self.living)
+    # ---
+
+    @property
+    def alive_slots(self):
+        """The rows that hold alive cells (a copy)."""
+        return self.living.to_array()
+    # ---
+
+    def _grow(self, needed):
+        """Enlarge the columns to hold at least `needed` rows."""
+        capacity = max(2*self.capacity, needed)
+
+        def enlarged(column):
+            new = np.empty((capacity,) + column.shape[1:],
+                           dtype=column.dtype)
+            new[:len(column)] = column
+            return new
+
+        self.index = enlarged(self.index)
+        self.father = enlarged(self.father)
+        self.coordinates = enlarged(self.coordinates)
+        self.genotype = enlarged(self.genotype)
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        
+        placed = np.zeros(capacity, dtype=bool)
+        placed[:len(self.placed)] = self.placed
+        self.placed = placed
+    # ---
+
+    def allocate(self, index, father=-1, genotype=0, reuse=True):
+        """Reserve a row for a new cell and return it.
+
+        If `reuse` is True, the rows of dead cells are recycled.
+
+        """
+        if reuse and self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.size
+            if slot >= self.capacity:
+                self._grow(slot + 1)
+            self.size += 1
+
+        self.index[slot] = index
+        self.father[slot] = father
+        self.coordinates[slot] = UNPLACED
+        self.placed[slot] = False
+        self.genotype[slot] = genotype
+        self.alive[slot] = True
+        self.living.add(slot)
+        self.genotypes.add_cells(genotype)
+        return slot
+    # ---
+
+    def allocate_many(self, indices, fathers, genotypes, reuse=True):
+        """Reserve rows for several new cells at once.
+
+        Return the array of reserved rows, in the same order as the
+        given indices, fathers and genotypes.
+
+        """
+        count = len(indices)
+        recycled = []
+        if reuse and self.free:
+            # Take the rows from the end of the free list
+            n_recycled = min(count, len(self.free))
+            recycled = self.free[-n_recycled:]
+            del self.free[-n_recycled:]
+
+        n_fresh = count - len(recycled)
+        if self.size + n_fresh > self.capacity:
+            self._grow(self.size + n_fresh)
+        fresh = np.arange(self.size, self.size + n_fresh, dtype=np.int64)
+        self.size += n_fresh
+
+        slots = np.concatenate([np.array(recycled, dtype=np.int64), fresh])
+        self.index[slots] = indices
+        self.father[slots] = fathers
+        self.coordinates[slots] = UNPLACED
+        self.placed[slots] = False
+        self.genotype[slots] = genotypes
+        self.alive[slots] = True
+        self.living.add_many(slots)
+        self.genotypes.add_many(self.genotype[slots])
+        return slots
+    # ---
+
+    def release(self, slot):
+        """Mark the row as dead and available for reuse."""
+        self.alive[slot] = False
+        self.living.remove(slot)
+        self.genotypes.remove_cells(self.genotype[slot])
+        self.free.append(slot)
+        self._sites = None
+    # ---
+
+    def release_many(self, slots):
+        """Mark several rows as dead and available for reuse."""
+        self.alive[slots] = False
+        self.living.remove_many(slots)
+        self.genotypes.remove_many(self.genotype[slots])
+        self.free.extend(np.asarray(slots).tolist())
+        self._sites = None
+    # ---
+
+    def located(self, slot):
+        """The coordinates of the cell in the given row (None if unplaced)."""
+        if not self.placed[slot]:
+            return None
+        return tuple(self.coordinates[slot].tolist())
+    # ---
+
+    def place(self, slot, site):
+        """Move the cell in the given row to the site.
+
+        The cell leaves the site it inhabited, if any, and the occupancy
+        of the world is updated. If the site is None, the cell is left
+        out of the world (it's last coordinates are kept).
+
+        """
+        placed = self.placed[slot]
+        if site is None:
+            if placed:
+                self._sites = None
+                self.world.update_occupancy_at(self.located(slot),
+                                               self.lineage, -1)
+                self.placed[slot] = False
+            return
+
+        coordinates = site.coordinates
+        previous = self.located(slot) if placed else None
+        if previous == coordinates:
+            return
+        if self.world is None:
+            # First placement, adapt to the dimensions of the world
+            self.world = site.world
+            if len(coordinates) != self.coordinates.shape[1]:
+                self.coordinates = np.full((self.capacity, len(coordinates)),
+                                           UNPLACED, dtype=np.int64)
+        elif site.world is not self.world:
+            raise ValueError('Cells of an array-backed lineage must inhabit '
+                             'a single world.')
+
+        self._sites = None
+        if previous is not None:
+            self.world.update_occupancy_at(previous, self.lineage, -1)
+        self.coordinates[slot] = coordinates
+        self.placed[slot] = True
+        self.world.update_occupancy(site, self.lineage, 1)
+    # ---
+
+    def place_many(self, slots, coordinates):
+        """Move the cells in the given rows to the given in-range coordinates.
+
+        The cells are moved all at once, as by ``place``, the world must be
+        known from a previous placement.
+
+        """
+        self.unplace_many(slots)
+        self.coordinates[slots] = coordinates
+        self.placed[slots] = True
+        self.world.update_occupancy_many(coordinates, self.lineage, 1)
+    # ---
+
+    def unplace_many(self, slots):
+        """Take the cells in the given rows out of their sites."""
+        slots = np.asarray(slots)
+        slots = slots[self.placed[slots]]
+        self._sites = None
+        if not len(slots):
+            return
+        self.world.update_occupancy_many(self.coordinates[slots],
+                                         self.lineage, -1)
+        self.placed[slots] = False
+    # ---
+
+    def site_of(self, slot):
+        """The site the cell in the given row inhabits (None if unplaced)."""
+        coordinates = self.located(slot)
+        if coordinates is None:
+            return None
+        return self.world.site_at(coordinates)
+    # ---
+
+    def slots_at(self, site):
+        """The rows of the alive cells in the site, as an array.
+
+        The rows of each site are grouped once, in a single pass over the
+        coordinates, and kept until a cell is placed or released.
+
+        """
+        if self._sites is None:
+            slots = self.living.to_array()
+            slots = slots[self.placed[slots]]
+            coordinates = self.coordinates[slots]
+
+            # Group the rows by site
+            distinct, inverse = np.unique(coordinates, axis=0,
+                                          return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.cumsum(np.bincount(inverse))[:-1]
+            self._sites = dict(zip(map(tuple, distinct.tolist()),
+                                   np.split(slots[order], bounds)))
+
+        return self._sites.get(site.coordinates, np.empty(0, dtype=np.int64))
+    # ---
+
+    def set_genotype(self, slot, genotype):
+        """Change the genotype of the cell in the given row."""
+        self.genotypes.move_cell(self.genotype[slot], genotype)
+        self.genotype[slot] = genotype
+    # ---
+
+    def set_genotypes(self, slots, genotypes):
+        """Change the genotypes of the cells in the given rows."""
+        self.genotypes.remove_many(self.genotype[slots])
+        self.genotypes.add_many(genotypes)
+        self.genotype[slots] = genotypes
+    # ---
+# --- CellColumns
@@ -14,6 +14,8 @@ This has a bigger functionality than it is needed, it would be useful to make a
 
 import collections
 
+from ..utils.rng import RandomStream
+
 
 class Entity:
     '''An entity is something that resides in the system.
@@ -67,11 +69,17 @@ class System:
     
     A log can be attached to the system to keep record of
     the actions and processes of the entities. 
+    
+    All the randomness of a system comes from it's random stream (see
+    ``RandomStream``): each entity with a `rng` attribute gets an 
+    independent child stream when added, so a whole run is reproducible
+    from the `random_seed` of the system.
 
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, random_seed=None, **kwargs):
         'Initialize an empty system.'
+        self.rng = RandomStream(random_seed)
         self.entities = set()
         self.procesable = set()
         self.toentity = {}
@@ -104,7 +112,13 @@ class System:
         
         Inithooks are callables called at initialization.
         
+        If the entity draws random numbers (it has a `rng` attribute), it
+        is given it's own stream, spawned from the system's, unless it
+        already has a seeded one (see ``RandomStream``).
+        
         """
+        if hasattr(entity, 'rng') and not getattr(entity.rng, 'seeded', True):
+            entity.rng = self.rng.spawn()
         self.entities.add(entity)
         if procesable:
             self.procesable.add(entity)
@@ -174,6 +188,11 @@ class System:
             self.step(log=log) 
     # ---
     
+    def spawn_streams(self, n):
+        """Independent random streams, e.g. for parallel workers."""
+        return self.rng.spawn(n)
+    # ---
+    
     def stateof(self, entityname):
         "Ask the entity for it's state"
         return self[entityname].state
@@ -0,0 +1,115 @@
+"""
+
+Heritable numeric traits.
+
+Traits such as the division or death rates of a cell are stored as
+columns indexed by genotype: a cell has the traits of it's genotype, so
+daughters inherit them without copying and the traits of any group of
+cells are a single gather. When a mutation creates a new genotype, it's
+traits are drawn from the ones of the parent by a pluggable effect.
+
+"""
+
+import numpy as np
+
+from ..utils.rng import default_stream
+
+
+class TraitTable:
+    """The numeric traits of the genotypes of a lineage.
+
+    The values are kept in a (genotypes x traits) float matrix. The
+    ancestral genotype has the default values, and each new genotype
+    gets the values returned by the `effect` function applied to the
+    values of it's parent, ``effect(values, rng) -> values`` (default is
+    to inherit them unchanged). Since a genotype is interned, the same
+    mutation on the same parent always has the same effect.
+
+    Example::
+
+        >>> traits = TraitTable({'division': 1.0, 'death': 0.5},
+        ...                     effect=driver_effect(sigma=0.2))
+        >>> table = GenotypeTable('AAAA', traits=traits)
+        >>> g = table.derive(0, (1, 'T'))
+        >>> traits.value(g, 'division')  # ~ 1.0 * lognormal(0, 0.2)
+
+    """
+
+    def __init__(self, defaults, effect=None, capacity=64, rng=None):
+        """
+        Params:
+
+            defaults (dict): The traits of the ancestral genotype, by name.
+            effect (optional callable): Draws the traits of a new genotype.
+            capacity (int): Number of genotypes initially reserved.
+            rng (optional RandomStream): The stream the effect draws from.
+
+        """
+        self.names = tuple(defaults)
+        self.index = {name: k for k, name in enumerate(self.names)}
+        self.values = np.empty((capacity, len(self.names)))
+        self.values[0] = [defaults[name] for name in self.names]
+        self.size = 1
+        self.effect = effect
+        self.rng = default_stream if rng is None else rng
+    # ---
+
+    def __len__(self):
+        return self.size
+    # ---
+
+    def __contains__(self, name):
+        return name in self.index
+    # ---
+
+    def register(self, genotype, parent):
+        """Assign the traits of a new genotype, derived from the parent."""
+        if genotype >= len(self.values):
+            values = np.empty((2*len(self.values), len(self.names)))
+            values[:self.size] = self.values[:self.size]
+            self.values = values
+
+        inherited = self.values[parent]
+        if self.effect is not None:
+            inherited = self.effect(inherited.copy(), self.rng)
+        self.values[genotype] = inherited
+        self.size = genotype + 1
+    # ---
+
+    def value(self, genotype, name):
+        """The value of a trait of the genotype."""
+        return float(self.values[genotype, self.index[name]])
+    # ---
+
+    def of(self, genotypes, name):
+        """The values of a trait for each of the given genotypes."""
+        return self.values[genotypes, self.index[name]]
+    # ---
+
+    def column(self, name):
+        """The values of a trait for all the genotypes (read-only view)."""
+        column = self.values[:self.size, self.index[name]]
+        column.flags.writeable = False
+        return column
+    # ---
+# --- TraitTable
+
+
+def driver_effect(sigma=0.1, probability=1.0, traits=None):
+    """An effect where some mutations are drivers that scale traits.
+
+    With the given `probability` a new genotype is a driver, and each of
+    the chosen `traits` (by position, default all of them) is multiplied
+    by an independent log-normal factor of parameter `sigma`. Else, the
+    traits are inherited unchanged.
+
+    """
+    def effect(values, rng):
+        if probability < 1 and rng.random() >= probability:
+            return values
+        chosen = slice(None) if traits is None else list(traits)
+        size = len(values) if traits is None else len(chosen)
+        values[chosen] *= rng.lognormal(0, sigma, size=size)
+        return values
+    return effect
+# ---
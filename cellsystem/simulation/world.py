@@ -1,9 +1,10 @@
 """Classes associated with physical space where entities live and interact."""
 
-import random as rnd
-
 import numpy as np
 
+from ..utils.rng import RandomStream
+from .neighborhoods import Neighborhood, neighborhood as make_neighborhood
+
 
 def wrap(n, maxValue):
     """Auxiliary function to wrap an integer on maxValue.
@@ -32,6 +33,17 @@ def wrap(n, maxValue):
     return n
 # ---
 
+def wrap_many(n, maxValue):
+    """Array version of ``wrap``, for an array of integers.
+
+    Example:
+            >>> wrap_many(np.arange(-3, 4), 3)
+            array([0, 1, 2, 0, 1, 2, 0])
+
+    """
+    return np.mod(n, maxValue)
+# ---
+
 def toroidal_wrap(grid, coord):
     """Return the coordinates wrapped on the grid dimensions."""
     return tuple(wrap(x, dim_size) 
@@ -39,6 +51,75 @@ def toroidal_wrap(grid, coord):
                         in zip(coord, grid.shape) )
 # ---
 
+def toroidal_wrap_many(grid, coordinates):
+    """Return the (n x d) array of coordinates wrapped on the grid dimensions."""
+    return wrap_many(np.asarray(coordinates), grid.shape)
+# ---
+
+def clipped_wrap(grid, coord):
+    """Return the coordinates moved to the nearest site of a bounded grid.
+
+    Out-of-range coordinates stay at the border, so in a bounded world
+    the cells cannot leave the grid.
+
+    """
+    return tuple(min(max(x, 0), dim_size - 1)
+                    for x,dim_size
+                        in zip(coord, grid.shape) )
+# ---
+
+def clipped_wrap_many(grid, coordinates):
+    """Return the (n x d) array of coordinates clipped to a bounded grid."""
+    return np.clip(coordinates, 0, np.array(grid.shape) - 1)
+# ---
+
+# The array versions of the wrap functions (see ``World.at_many``)
+toroidal_wrap.many = toroidal_wrap_many
+clipped_wrap.many = clipped_wrap_many
+
+
+def neighbor_table(world):
+    """The flat indices of the neighbors of each site of a bounded world.
+    
+    Row `i` holds the flat index of the neighbor at each offset of the 
+    neighborhood of the site with flat index `i`, wrapped as 
+    ``World.at`` would wrap it (-1 if out of the world). The table is
+    read-only, and the world keeps it until it's neighborhood or wrap
+    rule changes (see ``World.neighbor_table``).
+    
+    """
+    shape = world.shape
+    size = int(np.prod(shape))
+    coordinates = np.indices(shape).reshape(len(shape), -1).T
+    hood = world.neighborhood
+    flat_offsets = hood.flat_offsets(shape)
+    sites = np.arange(size)
+    dtype = np.int32 if size < 2**31 else np.int64
+    
+    table = np.empty((size, len(hood)), dtype=dtype)
+    for k, offset in enumerate(hood.offsets):
+        neighbors = coordinates + offset
+        
+        # Inside the grid, an offset is a fixed step of the flat index
+        inside = ((neighbors >= 0) & (neighbors < shape)).all(axis=1)
+        table[inside, k] = sites[inside] + flat_offsets[k]
+        
+        # Across the border, wrap
+        border = np.flatnonzero(~inside)
+        if getattr(world.wrap_function, 'many', None):
+            # Wrap all at once
+            table[border, k] = world.flat_indices(neighbors[border])
+            continue
+        
+        for i, coord in zip(border.tolist(), neighbors[border].tolist()):
+            try:
+                table[i, k] = world.at(tuple(coord)).flat_index
+            except IndexError:
+                table[i, k] = -1
+    table.flags.writeable = False
+    return table
+# ---
+
 
 
 class Site:
@@ -50,20 +131,27 @@ class Site:
     Is aware of:
             + World: The world it forms a part of.
             + Coordinates <i,j>: Coordinates in the matrix.
-            + Guests: <List>: The guests currently inhabiting this site.
+            + Guests: <Set>: The guests currently inhabiting this site.
+                      The cells of array-backed lineages are not kept
+                      here, their columns record the site instead (see
+                      ``CellColumns``).
 
     """
+    __slots__ = ('world', '_coordinates', 'guests', 'flat_index')
 
-    def __init__(self, world, coordinates):
+    def __init__(self, world, coordinates, flat_index=None):
         """Assemble a site in which agents may inhabit.
 
         :param world: The world which this forms a part of.
         :param coordinates: The coordinates in the world.
+        :param flat_index: The position of the site in the flattened grid
+                           of a dense world.
 
         """
         self.world = world
         self._coordinates = coordinates  # Set variable only once
         self.guests = set()
+        self.flat_index = flat_index
     # ---
 
     @property
@@ -74,7 +162,14 @@ class Site:
 
     def add_guest(self, guest):
         """Add the given cell as a new guest to this site."""
-        self.guests.add(guest)
+        if getattr(guest, 'slot', None) is not None:
+            # Array-backed, the columns keep the site
+            guest.site = self
+            return
+        
+        if guest not in self.guests:
+            self.guests.add(guest)
+            self.world.update_occupancy(self, getattr(guest, 'lineage', None), 1)
         guest.site = self
     # ---
 
@@ -84,16 +179,34 @@ class Site:
         If the cell is not currently in this site, an error is throwed.
         
         """
+        if getattr(guest, 'slot', None) is not None:
+            # Array-backed, the columns keep the site
+            if guest.lineage.columns.located(guest.slot) != self.coordinates:
+                raise KeyError('Guest with index {} is not at site ({})'
+                                            .format(guest.index, self.coordinates))
+            guest.site = None
+            return
+        
         try:
             self.guests.remove(guest)
         except KeyError:
             raise KeyError('Guest with index {} is not at site ({})'
                                             .format(guest.index, self.coordinates))
+        self.world.update_occupancy(self, getattr(guest, 'lineage', None), -1)
     # ---
 
     def guest_count(self):
-        """Return the number of guests residing in this site."""
-        return len(self.guests)
+        """Return the number of guests residing in this site.
+        
+        The guests of array-backed lineages are counted from their columns.
+        
+        """
+        count = len(self.guests)
+        for lineage in self.world.lineages:
+            columns = getattr(lineage, 'columns', None)
+            if columns is not None:
+                count += len(columns.slots_at(self))
+        return count
     # ---
 
     def random_neighbor(self):
@@ -117,30 +230,83 @@ class World:
             - Grid: The sites the action develops in.
             - Neighborhood: How many and which sites may directly influence or
                             be influenced by another.
+            - Occupancy: The number of cells in each site, in total and for
+                         each lineage, kept as integer arrays as the cells
+                         come and go (see ``occupancy``).
 
     """
 
-    def __init__(self, shape=(10, 10), wrap=toroidal_wrap):
+    def __init__(self, shape=(10, 10), wrap=toroidal_wrap, rng=None,
+                       neighborhood='moore'):
         """Initialize the world.
 
-        :param shape: Shape of the grid, a tuple of integers.
+        :param shape: Shape of the grid, a tuple of integers (of any length,
+                      a 3D grid is given as (n, m, l)).
         :param wrap: Callable. How does the grid treats out-of-range coordinates?
+        :param rng: The ``RandomStream`` to draw from (default a fresh one).
+        :param neighborhood: The kind of neighborhood ('moore', 'von_neumann'
+                             or 'hexagonal', see ``neighborhoods``), or a
+                             ``Neighborhood`` or a sequence of offsets.
 
         """
+        self.rng = RandomStream() if rng is None else rng
             
         self.shape = shape
         self.wrap_function = wrap  # Toroidal wrapping behavior of the grid
         
         # Initialize grid
-        self.grid = np.empty(shape, dtype=np.object)
+        self.grid = np.empty(shape, dtype=object)
         
-        for coord in np.ndindex(shape):
-            self.grid[coord] = Site(self, coord)
+        for flat_index, coord in enumerate(np.ndindex(shape)):
+            self.grid[coord] = Site(self, coord, flat_index)
+        self.sites = self.grid.reshape(-1)  # By flat index
+        
+        # Initialize the cell counts
+        self._occupancy = np.zeros(shape, dtype=np.int64)
+        self._lineage_occupancy = {}  # Lineage -> counts
         
         # Initialize neighborhood
-        self.neighborhood = [ (-1,-1), (-1, 0), (-1, 1),
-                              ( 0,-1), ( 0, 0), ( 0, 1),
-                              ( 1,-1), ( 1, 0), ( 1, 1) ]
+        self.neighborhood = make_neighborhood(neighborhood, ndim=len(shape))
+    # ---
+    
+    @property
+    def neighborhood(self):
+        """The offsets of the neighbors of a site (see ``Neighborhood``)."""
+        return self._neighborhood
+    
+    @neighborhood.setter
+    def neighborhood(self, offsets):
+        if not isinstance(offsets, Neighborhood):
+            offsets = Neighborhood(offsets)
+        ndim = len(self.shape) if self.shape is not None else self.ndim
+        if offsets.ndim != ndim:
+            raise ValueError('The neighborhood has {} dimensions, the world {}.'
+                             .format(offsets.ndim, ndim))
+        self._neighborhood = offsets
+        self._neighbor_table = None
+    # ---
+    
+    @property
+    def wrap_function(self):
+        """How does the grid treats out-of-range coordinates."""
+        return self._wrap_function
+    
+    @wrap_function.setter
+    def wrap_function(self, wrap):
+        self._wrap_function = wrap
+        self._neighbor_table = None
+    # ---
+    
+    @property
+    def neighbor_table(self):
+        """The flat indices of the neighbors of each site (see ``neighbor_table``).
+
+        Built the first time it is requested and kept by the world.
+
+        """
+        if self._neighbor_table is None:
+            self._neighbor_table = neighbor_table(self)
+        return self._neighbor_table
     # ---
     
     @property
@@ -150,6 +316,83 @@ class World:
         return self.at( tuple(x//2 for x in shape) )
     # ---
 
+    @property
+    def occupancy(self):
+        """Number of cells in each site (read-only view)."""
+        occupancy = self._occupancy.view()
+        occupancy.flags.writeable = False
+        return occupancy
+    # ---
+    
+    @property
+    def lineages(self):
+        """The lineages that have had cells in the world."""
+        return list(self._lineage_occupancy)
+    # ---
+    
+    def lineage_occupancy(self, lineage):
+        """Number of cells of the lineage in each site (read-only view)."""
+        counts = self._lineage_occupancy.get(lineage)
+        if counts is None:
+            counts = np.zeros(self.shape, dtype=np.int64)
+        counts = counts.view()
+        counts.flags.writeable = False
+        return counts
+    # ---
+    
+    def occupancy_of(self, site):
+        """Number of cells in the site."""
+        return int(self._occupancy[site.coordinates])
+    # ---
+    
+    def occupancy_at(self, coordinates):
+        """Number of cells in the sites at the given (n x d) in-range coordinates."""
+        coordinates = np.asarray(coordinates)
+        return self._occupancy[tuple(coordinates.T)]
+    # ---
+    
+    def update_occupancy(self, site, lineage, n):
+        """Count `n` more cells of the lineage in the site (may be negative).
+        
+        Called by the sites when their guests come and go, and by the 
+        engines that hold cells in a site without making them guests.
+        
+        """
+        self.update_occupancy_at(site.coordinates, lineage, n)
+    # ---
+    
+    def update_occupancy_at(self, coordinates, lineage, n):
+        """Count `n` more cells of the lineage at the in-range coordinates."""
+        self._occupancy[coordinates] += n
+        if lineage is None:
+            return
+        
+        counts = self._lineage_occupancy.get(lineage)
+        if counts is None:
+            counts = np.zeros(self.shape, dtype=np.int64)
+            self._lineage_occupancy[lineage] = counts
+        counts[coordinates] += n
+    # ---
+
+    def update_occupancy_many(self, coordinates, lineage, n):
+        """Count `n` more cells of the lineage at each of the (n x d) in-range coordinates.
+        
+        Repeated rows are counted as many times as they appear. `n` may
+        also be an array with the count of each row.
+        
+        """
+        coordinates = tuple(np.asarray(coordinates).T)
+        np.add.at(self._occupancy, coordinates, n)
+        if lineage is None:
+            return
+        
+        counts = self._lineage_occupancy.get(lineage)
+        if counts is None:
+            counts = np.zeros(self.shape, dtype=np.int64)
+            self._lineage_occupancy[lineage] = counts
+        np.add.at(counts, coordinates, n)
+    # ---
+
     def at(self, coordinates):
         """Get the site at the specified coordinates."""        
         # Wrap (toroidal coordinates)
@@ -158,6 +401,52 @@ class World:
             
         return self.grid[coordinates]
     # ---
+    
+    def site_at(self, coordinates):
+        """Get the site at the in-range coordinates (they are not wrapped)."""
+        return self.grid[coordinates]
+    # ---
+
+    def wrap_many(self, coordinates):
+        """Wrap an (n x d) array of coordinates as ``at`` would wrap each row.
+        
+        The array version of the wrap function (it's ``many`` attribute, see
+        ``toroidal_wrap_many``) is used if it has one, else the rows are 
+        wrapped one by one.
+        
+        """
+        coordinates = np.asarray(coordinates)
+        wrap = self.wrap_function
+        if not wrap:
+            return coordinates
+        many = getattr(wrap, 'many', None)
+        if many:
+            return many(self, coordinates)
+        
+        wrapped = [wrap(self, tuple(coord)) for coord in coordinates.tolist()]
+        return np.array(wrapped, dtype=coordinates.dtype).reshape(coordinates.shape)
+    # ---
+    
+    def flat_indices(self, coordinates):
+        """The flat indices of the sites at an (n x d) array of coordinates.
+        
+        The coordinates are wrapped as by ``at``.
+        
+        """
+        coordinates = self.wrap_many(coordinates)
+        return np.ravel_multi_index(tuple(coordinates.T), self.shape)
+    # ---
+    
+    def at_many(self, coordinates):
+        """Get the sites at each row of an (n x d) array of coordinates.
+        
+        Equivalent to calling ``at`` for each row, but wrapped and looked
+        up in single NumPy operations.
+        
+        """
+        coordinates = self.wrap_many(coordinates)
+        return self.grid[tuple(coordinates.T)]
+    # ---
 
     def random_neighbor_of(self, site):
         """Return the relative coordinates of the available neighbors.
@@ -166,12 +455,359 @@ class World:
         (a,b) means that a site at i,j has a neighbor at (i+a, j+b).
 
         """
-        # Get the site coordinates
-        coords = site.coordinates
+        # The neighbors of the site
+        neighbors = self.neighbor_table[site.flat_index]
         # Select a neighbor
-        n_coords = rnd.choice(self.neighborhood)
-        # Fetch the neighbor
-        neighbor = tuple(x + nx for x,nx in zip(coords, n_coords))
-        return self.at(neighbor)
+        neighbor = neighbors[self.rng.randrange(len(neighbors))]
+        if neighbor < 0:
+            raise IndexError('Neighbor of site {} out of the world.'
+                             .format(site.coordinates))
+        return self.sites[neighbor]
+    # ---
+    
+    def random_neighbor_indices(self, flat_indices):
+        """Return the flat index of a random neighbor of each of the given sites.
+        
+        :param flat_indices: An integer array of flat indices of sites.
+        
+        The neighbors are drawn at once and looked up in the neighbor table.
+        
+        """
+        table = self.neighbor_table
+        flat_indices = np.asarray(flat_indices)
+        chosen = self.rng.integers(table.shape[1], size=len(flat_indices))
+        neighbors = table[flat_indices, chosen]
+        if len(neighbors) and neighbors.min() < 0:
+            raise IndexError('Neighbors out of the world.')
+        return neighbors
+    # ---
+    
+    def random_neighbor_coordinates(self, coordinates):
+        """Return the coordinates of a random neighbor of each of the given.
+        
+        :param coordinates: An (n x d) integer array of coordinates.
+        
+        The neighbors are drawn at once, their coordinates are returned
+        wrapped on the grid as an (n x d) array.
+        
+        """
+        coordinates = np.asarray(coordinates)
+        flat_indices = np.ravel_multi_index(coordinates.T, self.shape)
+        neighbors = self.random_neighbor_indices(flat_indices)
+        unraveled = np.unravel_index(neighbors, self.shape)
+        return np.stack(unraveled, axis=-1).astype(coordinates.dtype, copy=False)
+    # ---
+    
+    def random_neighbors(self, coordinates):
+        """Return a random neighboring site for each of the given coordinates.
+        
+        :param coordinates: An (n x d) integer array of coordinates.
+        
+        The neighbors are drawn at once and returned in an array of sites.
+        
+        """
+        coordinates = np.asarray(coordinates)
+        flat_indices = np.ravel_multi_index(coordinates.T, self.shape)
+        return self.sites[self.random_neighbor_indices(flat_indices)]
+    # ---
+    
+    def sites_at(self, coordinates):
+        """Return the sites at each of the given (n x d) in-range coordinates."""
+        coordinates = np.asarray(coordinates)
+        return self.grid[tuple(coordinates.T)]
     # ---
 # --- World
+
+
+
+class SparseWorld(World):
+    """
+    A world whose sites are created only where they are needed.
+    
+    The sites are materialized in cubic chunks of `chunk_size` sites per
+    side, the first time a site of the chunk is accessed, so the cost of
+    a big world follows the region the cells explore. 
+    
+    The cell counts are kept for each chunk too, the ``occupancy`` 
+    arrays of the whole world are assembled from them when requested.
+    
+    If no shape is given, the world is unbounded: it has `ndim` 
+    dimensions, coordinates are never wrapped, and it's middle is the 
+    origin::
+    
+        >>> world = SparseWorld(shape=None)
+        >>> world.at((-5000, 12)).coordinates
+        (-5000, 12)
+        
+    """
+    
+    def __init__(self, shape=(10, 10), wrap=toroidal_wrap, rng=None, 
+                       chunk_size=32, ndim=2, neighborhood='moore'):
+        """Initialize the world.
+        
+        :param shape: Shape of the grid, a tuple of integers (None for an
+                      unbounded world).
+        :param wrap: Callable. How does the grid treats out-of-range 
+                     coordinates? (Ignored in an unbounded world.)
+        :param rng: The ``RandomStream`` to draw from (default a fresh one).
+        :param chunk_size: Number of sites per side of a chunk.
+        :param ndim: Number of dimensions of an unbounded world.
+        :param neighborhood: The kind of neighborhood (see ``World``).
+        
+        """
+        self.rng = RandomStream() if rng is None else rng
+        
+        self.shape = shape
+        if shape is None:
+            wrap = None
+        else:
+            ndim = len(shape)
+        self.ndim = ndim
+        self.wrap_function = wrap
+        
+        self.chunk_size = chunk_size
+        self.chunks = {}  # Chunk coordinates -> object array of sites
+        
+        # The cell counts of each chunk
+        self._chunk_occupancy = {}  # Chunk coordinates -> counts
+        self._lineage_chunks = {}  # Lineage -> chunk coordinates -> counts
+        
+        # Initialize neighborhood
+        self.neighborhood = make_neighborhood(neighborhood, ndim=ndim)
+    # ---
+    
+    @property
+    def middle(self):
+        """Get the site at the middle of the world (the origin if unbounded)."""
+        if self.shape is None:
+            return self.at( (0,) * self.ndim )
+        return super().middle
+    # ---
+    
+    @property
+    def site_count(self):
+        """Number of sites materialized so far."""
+        return sum(chunk.size for chunk in self.chunks.values())
+    # ---
+    
+    def _materialize(self, key):
+        """Create the sites of the chunk with the given coordinates."""
+        size = self.chunk_size
+        origin = tuple(k * size for k in key)
+        if self.shape is None:
+            extent = (size,) * self.ndim
+        else:
+            extent = tuple(min(size, dim - x) 
+                           for x, dim in zip(origin, self.shape))
+        
+        chunk = np.empty(extent, dtype=object)
+        for offset in np.ndindex(extent):
+            coordinates = tuple(x + dx for x, dx in zip(origin, offset))
+            chunk[offset] = Site(self, coordinates)
+        self.chunks[key] = chunk
+        self._chunk_occupancy[key] = np.zeros(extent, dtype=np.int64)
+        return chunk
+    # ---
+    
+    @property
+    def occupancy_origin(self):
+        """Coordinates of the first site of the ``occupancy`` arrays.
+        
+        The origin in a bounded world, else the lowest corner of the 
+        chunks materialized so far.
+        
+        """
+        if self.shape is not None or not self.chunks:
+            return (0,) * self.ndim
+        keys = np.array(list(self.chunks))
+        return tuple((keys.min(axis=0) * self.chunk_size).tolist())
+    # ---
+    
+    def _assemble(self, chunks):
+        """Gather the counts of the chunks in a single read-only array.
+        
+        The array spans the whole world if it is bounded, else the chunks
+        materialized so far, from the ``occupancy_origin``.
+        
+        """
+        size = self.chunk_size
+        origin = np.array(self.occupancy_origin)
+        if self.shape is not None:
+            extent = self.shape
+        elif self.chunks:
+            keys = np.array(list(self.chunks))
+            extent = tuple(((keys.max(axis=0) + 1) * size - origin).tolist())
+        else:
+            extent = (0,) * self.ndim
+        
+        assembled = np.zeros(extent, dtype=np.int64)
+        for key, counts in chunks.items():
+            start = np.array(key) * size - origin
+            region = tuple(slice(x, x + n) 
+                           for x, n in zip(start.tolist(), counts.shape))
+            assembled[region] = counts
+        assembled.flags.writeable = False
+        return assembled
+    # ---
+    
+    @property
+    def occupancy(self):
+        """Number of cells in each site (a read-only copy, see ``_assemble``)."""
+        return self._assemble(self._chunk_occupancy)
+    # ---
+    
+    @property
+    def lineages(self):
+        """The lineages that have had cells in the world."""
+        return list(self._lineage_chunks)
+    # ---
+    
+    def lineage_occupancy(self, lineage):
+        """Number of cells of the lineage in each site (a read-only copy)."""
+        return self._assemble(self._lineage_chunks.get(lineage, {}))
+    # ---
+    
+    def _locate(self, coordinates):
+        """The chunk and the position in it of the in-range coordinates."""
+        size = self.chunk_size
+        return (tuple(x // size for x in coordinates), 
+                tuple(x % size for x in coordinates))
+    # ---
+    
+    def occupancy_of(self, site):
+        """Number of cells in the site."""
+        key, offset = self._locate(site.coordinates)
+        return int(self._chunk_occupancy[key][offset])
+    # ---
+    
+    def occupancy_at(self, coordinates):
+        """Number of cells in the sites at the given (n x d) in-range coordinates."""
+        coordinates = np.asarray(coordinates).reshape(-1, self.ndim)
+        keys, offsets = np.divmod(coordinates, self.chunk_size)
+        counts = np.zeros(len(coordinates), dtype=np.int64)
+        
+        # Gather chunk by chunk
+        distinct, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for k, key in enumerate(distinct.tolist()):
+            chunk = self._chunk_occupancy.get(tuple(key))
+            if chunk is not None:
+                rows = inverse == k
+                counts[rows] = chunk[tuple(offsets[rows].T)]
+        return counts
+    # ---
+    
+    def update_occupancy_at(self, coordinates, lineage, n):
+        """Count `n` more cells of the lineage at the in-range coordinates."""
+        key, offset = self._locate(coordinates)
+        chunk = self._chunk_occupancy[key]
+        chunk[offset] += n
+        if lineage is None:
+            return
+        
+        chunks = self._lineage_chunks.setdefault(lineage, {})
+        counts = chunks.get(key)
+        if counts is None:
+            counts = chunks[key] = np.zeros(chunk.shape, dtype=np.int64)
+        counts[offset] += n
+    # ---
+    
+    def update_occupancy_many(self, coordinates, lineage, n):
+        """Count `n` more cells of the lineage at each of the (n x d) in-range coordinates.
+        
+        The counts are updated chunk by chunk. `n` may also be an array
+        with the count of each row.
+        
+        """
+        coordinates = np.asarray(coordinates).reshape(-1, self.ndim)
+        n = np.broadcast_to(n, len(coordinates))
+        keys, offsets = np.divmod(coordinates, self.chunk_size)
+        chunks = (self._lineage_chunks.setdefault(lineage, {})
+                  if lineage is not None else None)
+        
+        distinct, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for k, key in enumerate(map(tuple, distinct.tolist())):
+            if key not in self.chunks:
+                self._materialize(key)
+            chunk = self._chunk_occupancy[key]
+            inside = inverse == k
+            rows = tuple(offsets[inside].T)
+            np.add.at(chunk, rows, n[inside])
+            if chunks is None:
+                continue
+            
+            counts = chunks.get(key)
+            if counts is None:
+                counts = chunks[key] = np.zeros(chunk.shape, dtype=np.int64)
+            np.add.at(counts, rows, n[inside])
+    # ---
+    
+    def at(self, coordinates):
+        """Get the site at the specified coordinates."""
+        # Wrap (toroidal coordinates)
+        if self.wrap_function:
+            coordinates = self.wrap_function(self, coordinates)
+        elif self.shape is not None:
+            if not all(0 <= x < dim for x, dim in zip(coordinates, self.shape)):
+                raise IndexError('Coordinates {} out of the world.'
+                                 .format(coordinates))
+        
+        return self.site_at(coordinates)
+    # ---
+    
+    def site_at(self, coordinates):
+        """Get the site at the in-range coordinates (they are not wrapped)."""
+        key, offset = self._locate(coordinates)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self._materialize(key)
+        return chunk[offset]
+    # ---
+    
+    def random_neighbor_of(self, site):
+        """Return a random site in the neighborhood of the given one.
+        
+        The neighbor is found by offsetting the coordinates of the site,
+        sparse worlds are too big for a neighbor table.
+        
+        """
+        offset = self.rng.choice(self.neighborhood)
+        return self.at(tuple(x + dx for x, dx in zip(site.coordinates, offset)))
+    # ---
+    
+    def random_neighbor_coordinates(self, coordinates):
+        """Return the coordinates of a random neighbor of each of the given.
+        
+        :param coordinates: An (n x d) integer array of coordinates.
+        
+        """
+        coordinates = np.asarray(coordinates)
+        offsets = self.neighborhood.offsets
+        chosen = self.rng.integers(len(offsets), size=len(coordinates))
+        neighbors = coordinates + offsets[chosen]
+        
+        if self.shape is None:
+            return neighbors
+        return self.wrap_many(neighbors)
+    # ---
+    
+    def at_many(self, coordinates):
+        """Get the sites at each row of an (n x d) array of coordinates."""
+        return self.sites_at(self.wrap_many(coordinates))
+    # ---
+    
+    def random_neighbors(self, coordinates):
+        """Return a random neighboring site for each of the given coordinates."""
+        return self.sites_at(self.random_neighbor_coordinates(coordinates))
+    # ---
+    
+    def sites_at(self, coordinates):
+        """Return the sites at each of the given (n x d) in-range coordinates."""
+        coordinates = np.asarray(coordinates)
+        sites = np.empty(len(coordinates), dtype=object)
+        for i, coord in enumerate(coordinates.tolist()):
+            sites[i] = self.at(tuple(coord))
+        return sites
+    # ---
+# --- SparseWorld
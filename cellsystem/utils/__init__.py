@@ -1 +1,2 @@
-from .tree import Tree 
+from .tree import Tree
+from .indexed import IndexedSet, IndexedIntSet
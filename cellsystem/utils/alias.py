@@ -0,0 +1,94 @@
+"""
+Alias tables
+============
+
+Walker's alias method for sampling from a discrete distribution in
+constant time, after a linear time preprocessing.
+
+"""
+
+import numpy as np
+
+from .rng import default_stream
+
+
+class AliasTable:
+    """Sample indices with probability proportional to the given weights.
+
+    The table splits the distribution in ``n`` equiprobable columns, each
+    holding at most two outcomes: the column's own index, kept with
+    probability ``probability[i]``, and it's ``alias[i]``. A draw
+    picks a column and a side of it, so it takes O(1) regardless of the
+    number of outcomes.
+
+    Example::
+
+        >>> table = AliasTable([1, 2, 1])
+        >>> table.draw() in (0, 1, 2)
+        True
+        >>> table.sample(5).shape
+        (5,)
+
+    """
+    __slots__ = ('probability', 'alias', '_probability', '_alias')
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        n = len(weights)
+        if not n:
+            raise ValueError('At least one weight is needed.')
+        if (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError('Weights must be non-negative and not all zero.')
+
+        # Scale so that the mean column height is 1
+        scaled = weights * n / weights.sum()
+        probability = np.ones(n)
+        alias = np.arange(n)
+
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            # Fill the column s with the outcome l
+            probability[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            if scaled[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+        # The remaining columns are full (up to rounding error)
+
+        probability.flags.writeable = False
+        alias.flags.writeable = False
+        self.probability = probability
+        self.alias = alias
+        # Python copies for fast scalar draws
+        self._probability = probability.tolist()
+        self._alias = alias.tolist()
+    # ---
+
+    def __len__(self):
+        return len(self._alias)
+    # ---
+
+    def draw(self, rng=None):
+        """Draw a single index (from the given ``RandomStream``)."""
+        if rng is None:
+            rng = default_stream
+        r = rng.random() * len(self._alias)
+        column = int(r)
+        if r - column < self._probability[column]:
+            return column
+        return self._alias[column]
+    # ---
+
+    def sample(self, size, rng=None):
+        """Draw an array of `size` indices at once."""
+        if rng is None:
+            rng = default_stream
+        columns = rng.integers(len(self._alias), size=size)
+        keep = rng.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+    # ---
+# --- AliasTable
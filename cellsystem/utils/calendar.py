@@ -0,0 +1,95 @@
+"""
+Calendar queues
+===============
+
+Priority queues of timed events, bucketed by time so that taking the
+events due in a period only touches the buckets of that period.
+
+"""
+
+import heapq
+import itertools
+import math
+
+
+class CalendarQueue:
+    """A priority queue of events ordered by their time.
+
+    The events are kept in buckets (the "days" of the calendar) of the
+    given `width` of time, and only the buckets in use are stored. The
+    events inside a bucket are ordered with a heap, and the keys of the
+    buckets in use with another one, so the cost of an operation depends
+    on the number of events of a day and the number of days in use, not
+    on the total number of events. Events with the same time are taken
+    in the order they were pushed.
+
+    Example::
+
+        >>> queue = CalendarQueue(width=1.0)
+        >>> queue.push(2.5, 'b')
+        >>> queue.push(0.5, 'a')
+        >>> [item for time, item in queue.pop_until(2)]
+        ['a']
+        >>> len(queue)
+        1
+
+    """
+
+    def __init__(self, width=1.0):
+        """
+        Params:
+
+            width (float): The span of time of each bucket.
+
+        """
+        self.width = width
+        self.buckets = {}  # Bucket key -> heap of (time, order, item)
+        self.keys = []  # Heap of the keys of the buckets in use
+        self.size = 0
+        self._order = itertools.count()
+    # ---
+
+    def __len__(self):
+        return self.size
+    # ---
+
+    def push(self, time, item):
+        """Add an item due at the given time."""
+        key = math.floor(time / self.width)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = []
+            heapq.heappush(self.keys, key)
+        heapq.heappush(bucket, (time, next(self._order), item))
+        self.size += 1
+    # ---
+
+    def peek_time(self):
+        """The time of the next item (None if the queue is empty)."""
+        if not self.keys:
+            return None
+        return self.buckets[self.keys[0]][0][0]
+    # ---
+
+    def pop(self):
+        """Remove the next item and return the pair ``(time, item)``."""
+        key = self.keys[0]
+        bucket = self.buckets[key]
+        time, _, item = heapq.heappop(bucket)
+        if not bucket:
+            del self.buckets[key]
+            heapq.heappop(self.keys)
+        self.size -= 1
+        return time, item
+    # ---
+
+    def pop_until(self, end):
+        """Iterate the pairs ``(time, item)`` due before `end`, in order.
+
+        Items pushed while iterating are also taken if they are due.
+
+        """
+        while self.keys and self.peek_time() < end:
+            yield self.pop()
+    # ---
+# --- CalendarQueue
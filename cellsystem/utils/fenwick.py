@@ -0,0 +1,115 @@
+"""
+Fenwick trees
+=============
+
+Binary indexed trees of non-negative weights, used to pick an item with
+probability proportional to it's weight while the weights change.
+
+"""
+
+
+class FenwickTree:
+    """A list of non-negative weights with O(log n) prefix sums.
+
+    Setting a weight, computing the sum of the first weights and finding
+    the item a cumulative weight falls into all take O(log n), so a
+    weighted random pick over items whose weights keep changing costs
+    O(log n) per pick and per change.
+
+    Example::
+
+        >>> tree = FenwickTree(4)
+        >>> tree[0], tree[2] = 1.0, 3.0
+        >>> tree.total
+        4.0
+        >>> tree.find(0.5), tree.find(1.5)
+        (0, 2)
+
+    """
+    __slots__ = ('_values', '_tree')
+
+    def __init__(self, capacity=1024):
+        self._values = [0.0] * capacity
+        self._tree = [0.0] * (capacity + 1)
+    # ---
+
+    def __len__(self):
+        return len(self._values)
+    # ---
+
+    def __getitem__(self, i):
+        return self._values[i]
+    # ---
+
+    def __setitem__(self, i, value):
+        """Set the weight of the item `i`."""
+        delta = value - self._values[i]
+        self._values[i] = value
+        tree = self._tree
+        n = len(tree)
+        i += 1
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+    # ---
+
+    @property
+    def total(self):
+        """The sum of all the weights."""
+        return self.prefix_sum(len(self._values))
+    # ---
+
+    def prefix_sum(self, end):
+        """The sum of the weights of the items before `end`."""
+        tree = self._tree
+        total = 0.0
+        while end > 0:
+            total += tree[end]
+            end -= end & -end
+        return total
+    # ---
+
+    def find(self, u):
+        """The item where the cumulative weight `u` falls.
+
+        That is, the first item `i` such that the sum of the weights up to
+        and including `i` exceeds `u`. Values of `u` beyond the total
+        weight give the last item.
+
+        """
+        tree = self._tree
+        n = len(self._values)
+        position = 0
+        step = 1 << n.bit_length()
+        while step:
+            following = position + step
+            if following <= n and tree[following] <= u:
+                position = following
+                u -= tree[following]
+            step >>= 1
+        return min(position, n - 1)
+    # ---
+
+    def grow(self, capacity):
+        """Make room for `capacity` items, the new ones weighting zero."""
+        if capacity > len(self._values):
+            self._values.extend([0.0] * (capacity - len(self._values)))
+            self.rebuild()
+    # ---
+
+    def rebuild(self):
+        """Recompute the tree from the weights in O(n).
+
+        This also clears the rounding error accumulated by the updates.
+
+        """
+        values = self._values
+        n = len(values)
+        tree = [0.0] + values
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+    # ---
+# --- FenwickTree
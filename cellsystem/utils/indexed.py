@@ -0,0 +1,226 @@
+"""
+Indexed containers
+==================
+
+Sets that keep their items in a contiguous array, so that inserting,
+removing and picking an item at random take constant time.
+
+"""
+
+import numpy as np
+
+from .rng import default_stream
+
+
+class IndexedSet:
+    """A set of hashable items with O(1) random access.
+
+    The items are kept in a list and a dict maps each item to it's
+    position. Removal swaps the last item into the freed position.
+
+    Example::
+
+        >>> s = IndexedSet(['a', 'b', 'c'])
+        >>> s.remove('a')
+        >>> 'a' in s, len(s)
+        (False, 2)
+        >>> s.random_choice() in s
+        True
+
+    """
+
+    def __init__(self, items=()):
+        self._items = []
+        self._positions = {}
+        for item in items:
+            self.add(item)
+    # ---
+
+    def __len__(self):
+        return len(self._items)
+    # ---
+
+    def __contains__(self, item):
+        return item in self._positions
+    # ---
+
+    def __iter__(self):
+        return iter(self._items)
+    # ---
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self._items)
+    # ---
+
+    def add(self, item):
+        """Add an item, if not already present."""
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+    # ---
+
+    def remove(self, item):
+        """Remove an item. Raise KeyError if not present."""
+        position = self._positions.pop(item)
+        last = self._items.pop()
+        if position < len(self._items):
+            # Fill the hole with the last item
+            self._items[position] = last
+            self._positions[last] = position
+    # ---
+
+    def discard(self, item):
+        """Remove an item if present."""
+        if item in self._positions:
+            self.remove(item)
+    # ---
+
+    def random_choice(self, rng=None):
+        """Return an item picked uniformly at random."""
+        if rng is None:
+            rng = default_stream
+        return self._items[rng.randrange(len(self._items))]
+    # ---
+
+    def sample(self, n, rng=None):
+        """Return a list of `n` distinct items picked at random."""
+        if rng is None:
+            rng = default_stream
+        items = self._items
+        return [items[i] for i in rng.sample(len(items), n).tolist()]
+    # ---
+
+    def permutation(self, rng=None):
+        """Iterate the current items in random order.
+
+        The iteration is over a snapshot of the items, so the set may be
+        modified while iterating.
+
+        """
+        if rng is None:
+            rng = default_stream
+        snapshot = list(self._items)
+        order = rng.permutation(len(snapshot))
+        return map(snapshot.__getitem__, order.tolist())
+    # ---
+# --- IndexedSet
+
+
+
+class IndexedIntSet:
+    """A set of non-negative integers backed by NumPy arrays.
+
+    Like ``IndexedSet``, but the items and their positions are stored
+    in integer arrays, so the whole set can be handed to NumPy without
+    conversion.
+
+    """
+
+    def __init__(self, capacity=1024):
+        self._items = np.empty(capacity, dtype=np.int64)
+        self._positions = np.full(capacity, -1, dtype=np.int64)
+        self._size = 0
+    # ---
+
+    def __len__(self):
+        return self._size
+    # ---
+
+    def __contains__(self, item):
+        return (0 <= item < len(self._positions)
+                and self._positions[item] >= 0)
+    # ---
+
+    def __iter__(self):
+        return iter(self.to_array().tolist())
+    # ---
+
+    def _reserve(self, size, max_item):
+        """Make room for `size` items with values up to `max_item`."""
+        if size > len(self._items):
+            items = np.empty(max(2*len(self._items), size), dtype=np.int64)
+            items[:self._size] = self._items[:self._size]
+            self._items = items
+
+        if max_item >= len(self._positions):
+            positions = np.full(max(2*len(self._positions), max_item + 1),
+                                -1, dtype=np.int64)
+            positions[:len(self._positions)] = self._positions
+            self._positions = positions
+    # ---
+
+    def add(self, item):
+        """Add an item, if not already present."""
+        if item in self:
+            return
+        self._reserve(self._size + 1, item)
+        self._items[self._size] = item
+        self._positions[item] = self._size
+        self._size += 1
+    # ---
+
+    def add_many(self, items):
+        """Add several items, none of them may be already present."""
+        items = np.asarray(items, dtype=np.int64)
+        if not len(items):
+            return
+        start, end = self._size, self._size + len(items)
+        self._reserve(end, items.max())
+        self._items[start:end] = items
+        self._positions[items] = np.arange(start, end)
+        self._size = end
+    # ---
+
+    def remove(self, item):
+        """Remove an item. Raise KeyError if not present."""
+        if item not in self:
+            raise KeyError(item)
+        position = self._positions[item]
+        self._size -= 1
+        last = self._items[self._size]
+        self._items[position] = last
+        self._positions[last] = position
+        self._positions[item] = -1
+    # ---
+
+    def remove_many(self, items):
+        """Remove several items, all of them must be present."""
+        items = np.asarray(items, dtype=np.int64)
+        if not len(items):
+            return
+        keep = np.ones(self._size, dtype=bool)
+        keep[self._positions[items]] = False
+        remaining = self._items[:self._size][keep]
+
+        self._positions[items] = -1
+        self._size = len(remaining)
+        self._items[:self._size] = remaining
+        self._positions[remaining] = np.arange(self._size)
+    # ---
+
+    def to_array(self):
+        """A copy of the items as an array."""
+        return self._items[:self._size].copy()
+    # ---
+
+    def random_choice(self, rng=None):
+        """Return an item picked uniformly at random."""
+        if rng is None:
+            rng = default_stream
+        return int(self._items[rng.randrange(self._size)])
+    # ---
+
+    def sample(self, n, rng=None):
+        """Return an array of `n` distinct items picked at random."""
+        if rng is None:
+            rng = default_stream
+        return self._items[rng.sample(self._size, n)]
+    # ---
+
+    def permutation(self, rng=None):
+        """Return the current items in random order, as an array."""
+        if rng is None:
+            rng = default_stream
+        return rng.permutation(self._items[:self._size])
+    # ---
+# --- IndexedIntSet
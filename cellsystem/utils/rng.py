@@ -0,0 +1,116 @@
+"""
+Random streams
+==============
+
+A single source of randomness for the simulations. A stream wraps a
+NumPy ``Generator`` seeded by a ``SeedSequence``, so a whole run can be
+reproduced from one seed, and independent child streams can be handed
+out to the parts of a system or to parallel workers.
+
+"""
+
+import math
+
+import numpy as np
+
+
+class RandomStream:
+    """A seeded random stream with buffered scalar draws.
+
+    Scalar uniforms are pre-drawn in blocks of `block` numbers, so a
+    scalar draw costs a list pop instead of a call into NumPy. Random
+    indices and choices are derived from those uniforms. Array draws and
+    any other distribution of ``numpy.random.Generator`` (``integers``,
+    ``poisson``, ``binomial``, ...) are drawn directly by the generator.
+
+    Example::
+
+        >>> rng = RandomStream(seed=42)
+        >>> rng.random() < 1
+        True
+        >>> rng.poisson(2.0, size=3).shape
+        (3,)
+
+        # Independent streams, reproducible from the parent's seed
+        >>> world_rng, cells_rng = rng.spawn(2)
+
+    """
+
+    def __init__(self, seed=None, block=4096):
+        """
+        Params:
+
+            seed (optional int or SeedSequence): The seed of the stream.
+                    Default is a fresh seed from the operating system.
+            block (int): Number of scalar uniforms drawn at once.
+
+        The stream is `seeded` if a seed was given (spawned streams are).
+
+        """
+        self.seeded = seed is not None
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.default_rng(seed)
+        self.block = block
+        self._uniforms = []
+    # ---
+
+    def __getattr__(self, name):
+        """Delegate the other distributions to the generator."""
+        # Not the private names, nor before the generator exists (as 
+        # while copying or unpickling)
+        if name.startswith('_') or 'generator' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.generator, name)
+    # ---
+
+    def __repr__(self):
+        return "{}(entropy={})".format(self.__class__.__name__,
+                                       self.seed_sequence.entropy)
+    # ---
+
+    def spawn(self, n=None):
+        """Independent child streams.
+
+        Return a single stream, or a list of `n` streams if `n` is given.
+
+        """
+        children = [RandomStream(child, self.block)
+                    for child in self.seed_sequence.spawn(n or 1)]
+        return children if n is not None else children[0]
+    # ---
+
+    def random(self, size=None):
+        """A uniform number in [0, 1), or an array of them."""
+        if size is not None:
+            return self.generator.random(size)
+        if not self._uniforms:
+            self._uniforms = self.generator.random(self.block).tolist()
+        return self._uniforms.pop()
+    # ---
+
+    def randrange(self, n):
+        """A random integer in [0, n)."""
+        return int(self.random() * n)
+    # ---
+
+    def choice(self, sequence):
+        """A random item of a non-empty sequence."""
+        return sequence[int(self.random() * len(sequence))]
+    # ---
+
+    def expovariate(self, rate):
+        """An exponentially distributed number with the given rate."""
+        return -math.log(1.0 - self.random()) / rate
+    # ---
+
+    def sample(self, n, k):
+        """An array of `k` distinct integers in [0, n)."""
+        return self.generator.choice(n, size=k, replace=False)
+    # ---
+# --- RandomStream
+
+
+# The stream used when none is given
+default_stream = RandomStream()
@@ -132,7 +132,7 @@ setup(
     # Similar to `install_requires` above, these must be valid existing
     # projects.
     extras_require={  # Optional
-        'dev': ['jupyter']
+        'dev': ['jupyter'],
     },
 
     # List additional URLs that are relevant to your project as a dict.